@@ -4,24 +4,45 @@
 
 # load standard modules
 import argparse
+import asyncio
+import concurrent.futures
+import functools
+import io
 import json
 import urllib
 import os
-import jinja2
+import shutil
+import tempfile
+import numpy as np
 import pandas as pd
 import ephem 
 import datetime as dt
 import logging
+import time
 # import pytz <-- we should probably use this instead of hardcoding timezone offset 
+# jinja2 and requests are imported where they are used, a run from cached
+# coordinates without a page imports neither
 # load ACRC modules
 import data_helpers as dh
 import stations as ws
+import solar
+import cache
+import tables
+import instrument
 
 logging.basicConfig(level=logging.DEBUG)
 
 ## configuration
 TEMPLATEFN = 'daylight.html'
+LAZYTEMPLATEFN = 'daylight_lazy.html'
 OUTPUTFN = 'daynight.html'
+# per-station json files for the lazy page, relative to the output directory
+DATADIR = 'data'
+# rise/set times of all stations, see tables.py
+TABLESFN = 'daynight.tables'
+# the workers spool each station's highcharts strings to files in a temporary
+# directory with this prefix under the output directory until the page is written
+SPOOLPREFIX = 'spool'
 PATH = os.path.dirname(os.path.abspath(__file__))
 
 # ACIS variables
@@ -29,6 +50,22 @@ ACIS_STATION_URL = "https://data.rcc-acis.org/StnMeta?"
 
 TIMEZONEOFFSET_H = -9
 
+# station coordinates are kept on disk and refreshed after METATTL_DAYS
+CACHEDIR = os.path.join(PATH, 'cache')
+METACACHEFN = 'stnmeta.json'
+METATTL_DAYS = 30
+# StnMeta requests in flight at once, and seconds between request starts
+ACIS_CONCURRENCY = 4
+ACIS_INTERVAL = 0.2
+
+# computed rise/set tables are cached under a hash of their inputs,
+# bump RESULTS_VERSION whenever the computation changes
+TABLECACHEDIR = 'tables'
+TABLECACHE_MB = 256
+# compiled templates are kept under the cache directory
+TEMPLATECACHEDIR = 'templates'
+RESULTS_VERSION = 4
+
 # ephem variables
 # horizon angle day (this overrides ephem settings for computing atmospheric refraction 
 # near horizon and sets these parameters to match the Navy Astronomical Almanac
@@ -38,12 +75,64 @@ horizonDay = '-0:34'
 horizonCivil = '-6'
 horizonNautical = '-12'
 horizonAstronomical = '-18'
-
-def load_template(path=PATH, templatefn=TEMPLATEFN):
-    """Load jinja2 template"""
-    templateLoader = jinja2.FileSystemLoader( searchpath=PATH )
-    templateEnv = jinja2.Environment( loader=templateLoader )
-    return templateEnv.get_template(TEMPLATEFN)
+# rise/set times keep the ephem dates to this datetime64 unit, the
+# table file and the charts round them to whole seconds
+EVENTPRECISION = 'us'
+
+# columns computed for every station: (rise column, set column, horizon, use_center)
+HORIZONS = [
+    ('sunrise', 'sunset', horizonDay, False),
+    ('civil_rise', 'civil_set', horizonCivil, True),
+    ('naut_rise', 'naut_set', horizonNautical, True),
+    ('astr_rise', 'astr_set', horizonAstronomical, True),
+]
+
+# highcharts series for every station: (template variable suffix, low column, high column)
+SERIES = [
+    ('Day', 'sunrise', 'sunset'),
+    ('Civil_twilight_AM', 'civil_rise', 'sunrise'),
+    ('Civil_twilight_PM', 'sunset', 'civil_set'),
+    ('Nautical_twilight_AM', 'naut_rise', 'civil_rise'),
+    ('Nautical_twilight_PM', 'civil_set', 'naut_set'),
+    ('Astro_twilight_AM', 'astr_rise', 'naut_rise'),
+    ('Astro_twilight_PM', 'naut_set', 'astr_set'),
+    ('Night_AM', 'zeroAM', 'astr_rise'),
+    ('Night_PM', 'astr_set', 'zeroPM'),
+]
+
+# columns of the per-station event matrix (milliseconds of day): the rise/set
+# columns of HORIZONS, then the start and end of the day
+EVENTS = [column for item in HORIZONS for column in item[:2]] + ['zeroAM', 'zeroPM']
+DAY_MS = 24 * 3600 * 1000
+
+# rows formatted at a time when writing highcharts range arrays
+RANGECHUNK = 4096
+
+# default date range, and days computed at a time for each station
+STARTDATE = '2018-01-01'
+ENDDATE = '2018-12-31'
+CHUNKDAYS = 366
+
+# rise/set engines: ephem solves day by day, numpy computes all days at once
+ENGINES = ('ephem', 'numpy')
+# --tolerance-seconds mode: days between the first exact solves, parts an interval
+# is cut into to check it, how close (in seconds) an event may come to the start of
+# its search and how close (in days) to a polar day or night before that day is solved
+ADAPTIVESTEP = 32
+ADAPTIVESAMPLES = 4
+ADAPTIVEEDGE = 600
+ADAPTIVEPOLAR = 3
+
+def load_template(path=PATH, templatefn=TEMPLATEFN, cache_dir=None):
+    """Load jinja2 template, compiled code is reused from cache_dir if given"""
+    import jinja2
+    bytecodeCache = None
+    if cache_dir:
+        os.makedirs(os.path.join(cache_dir, TEMPLATECACHEDIR), exist_ok=True)
+        bytecodeCache = jinja2.FileSystemBytecodeCache(os.path.join(cache_dir, TEMPLATECACHEDIR))
+    templateLoader = jinja2.FileSystemLoader( searchpath=path )
+    templateEnv = jinja2.Environment( loader=templateLoader, bytecode_cache=bytecodeCache )
+    return templateEnv.get_template(templatefn)
 
 
 def parse_arguments():
@@ -55,48 +144,250 @@ def parse_arguments():
     parser.add_argument(
         "dir", help="name of output directory",
         default='testdir')
+    parser.add_argument(
+        "--engine", help="rise/set engine", choices=ENGINES,
+        default='ephem')
+    parser.add_argument(
+        "--render", choices=('inline', 'lazy', 'none'), default='inline',
+        help="inline: all stations in the page, lazy: one json file per station loaded on selection, "
+             "none: only write the rise/set table file")
+    parser.add_argument(
+        "--start", help="first date (YYYY-MM-DD)", default=STARTDATE)
+    parser.add_argument(
+        "--end", help="last date (YYYY-MM-DD)", default=ENDDATE)
+    parser.add_argument(
+        "--chunk-days", help="days computed at a time for each station", type=int,
+        default=CHUNKDAYS)
+    parser.add_argument(
+        "--tolerance-seconds", type=float,
+        help="ephem engine: solve only some days exactly and interpolate the others, "
+             "splitting intervals until their checked days are within this many seconds")
+    parser.add_argument(
+        "--check-tolerance", action='store_true',
+        help="also solve every day and report the largest interpolation error (--profile)")
+    parser.add_argument(
+        "--jobs", help="number of worker processes", type=int,
+        default=1)
+    parser.add_argument(
+        "--cache-dir", help="directory for cached station metadata, tables and compiled templates",
+        default=CACHEDIR)
+    parser.add_argument(
+        "--meta-ttl", help="days before cached station coordinates are refreshed",
+        type=float, default=METATTL_DAYS)
+    parser.add_argument(
+        "--offline", help="never contact ACIS, use cached coordinates only",
+        action='store_true')
+    parser.add_argument(
+        "--acis-url", help="ACIS StnMeta endpoint (e.g. a local fake_acis.py server)",
+        default=ACIS_STATION_URL)
+    parser.add_argument(
+        "--cache-size", help="size limit of the rise/set table cache in MB, 0 disables it",
+        type=float, default=TABLECACHE_MB)
+    parser.add_argument(
+        "--profile", help="write a json report of stage timings and counters to this file")
+    parser.add_argument(
+        "--cprofile", help="write cProfile stats of the main process to this file")
     return parser.parse_args()
 
 
 def get_acis_stn_latlon(
         acis_station_url=ACIS_STATION_URL,
-        stationtype=1):
-    stations = [
-        (key, val[0]) for (key, val) in ws.stations.items() 
-            if val[stationtype] == 1]
+        stationtype=1,
+        cache_file=None,
+        ttl_days=METATTL_DAYS,
+        offline=False):
+    stations = ws.registry.select(stationtype)
     stationnamess = [item[0] for item in stations]
     stationIDs = [item[1] for item in stations]
-    #get location data from acis
-    logging.info("Getting latlon data for stations")
-    acis_params = {}
-    acis_params['sids'] = ','.join(stationIDs)
-    acis_params['meta'] = 'll'
-    acis_station_data = dh.read_data(acis_station_url, params=acis_params)
-    station_meta = { 
-        name: {'lon': item['ll'][0], 'lat': item['ll'][1]} 
-        for (name, item) in zip(stationnamess, acis_station_data['meta'])
-    }
+
+    #coordinates already on disk, keyed by station id
+    cached = cache.load_json(cache_file) if cache_file else {}
+    now = time.time()
+    fetch = stale_ids(cached, stationIDs, ttl_days, now)
+
+    #get missing or stale location data from acis
+    if fetch and offline:
+        logging.warning("Offline: no fresh latlon data for {}".format(', '.join(fetch)))
+    elif fetch:
+        logging.info("Getting latlon data for {} stations".format(len(fetch)))
+        acis_params = {}
+        acis_params['sids'] = ','.join(fetch)
+        acis_params['meta'] = 'll,sids'
+        acis_station_data = dh.read_batched(acis_station_url, params=acis_params)
+        store_latlon(cached, acis_station_data, fetch, now)
+        if cache_file:
+            cache.save_json(cache_file, cached)
+
+    station_meta = {}
+    for (name, sid) in zip(stationnamess, stationIDs):
+        if sid not in cached:
+            logging.warning("No latlon data for {} ({})".format(name, sid))
+            continue
+        station_meta[name] = {'lon': cached[sid]['ll'][0], 'lat': cached[sid]['ll'][1]}
     return station_meta
 
 
+## ids without cached coordinates or with coordinates older than ttl_days
+def stale_ids(cached, stationIDs, ttl_days, now):
+    return sorted(
+        sid for sid in set(stationIDs)
+        if sid not in cached or now - cached[sid]['fetched'] > ttl_days * 86400)
+
+
+## keep the coordinates a StnMeta response gives for the ids in fetch
+def store_latlon(cached, acis_station_data, fetch, now):
+    if 'meta' not in acis_station_data:
+        #ACIS reports bad requests as {"error": ...} with status 200
+        raise ValueError("ACIS StnMeta answered without meta: {}".format(
+            acis_station_data.get('error', acis_station_data)))
+    for item in acis_station_data['meta']:
+        ids = set(sid.split()[0] for sid in item.get('sids', []))
+        for sid in fetch:
+            if sid in ids:
+                cached[sid] = {'ll': item['ll'], 'fetched': now}
+
+
+## like get_acis_stn_latlon, but puts lists of (name, lat, lon) on queue as they become
+## known: cached stations first, then each StnMeta batch as it lands, then None (also
+## when this fails, the error is raised after it).
+## At most concurrency requests run at once, started at least interval seconds apart.
+async def stream_acis_stn_latlon(
+        queue,
+        acis_station_url=ACIS_STATION_URL,
+        stationtype=1,
+        cache_file=None,
+        ttl_days=METATTL_DAYS,
+        offline=False,
+        concurrency=ACIS_CONCURRENCY,
+        interval=ACIS_INTERVAL):
+    #the None goes out even if this fails, the consumer would wait for it forever
+    try:
+        stations = ws.registry.select(stationtype)
+        cached = cache.load_json(cache_file) if cache_file else {}
+        now = time.time()
+        fetch = stale_ids(cached, [sid for (name, sid) in stations], ttl_days, now)
+        if fetch and offline:
+            logging.warning("Offline: no fresh latlon data for {}".format(', '.join(fetch)))
+            fetch = []
+
+        def ready(ids):
+            return [
+                (name, cached[sid]['ll'][1], cached[sid]['ll'][0])
+                for (name, sid) in stations if sid in ids and sid in cached]
+
+        await queue.put(ready(set(sid for (name, sid) in stations) - set(fetch)))
+
+        loop = asyncio.get_running_loop()
+        semaphore = asyncio.Semaphore(concurrency)
+        next_start = [loop.time()]
+
+        async def get_batch(batch):
+            import requests
+            async with semaphore:
+                wait = next_start[0] - loop.time()
+                next_start[0] = max(next_start[0], loop.time()) + interval
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                acis_params = {'sids': ','.join(batch), 'meta': 'll,sids'}
+                try:
+                    with instrument.span('acis_fetch'):
+                        acis_station_data = await loop.run_in_executor(
+                            None, dh.read_data, acis_station_url, acis_params)
+                    store_latlon(cached, acis_station_data, batch, now)
+                except (requests.RequestException, ValueError) as error:
+                    logging.warning("Getting latlon data for {} stations failed: {}".format(len(batch), error))
+                    instrument.count('acis_failed_batches')
+            await queue.put(ready(set(batch)))
+
+        if fetch:
+            logging.info("Getting latlon data for {} stations".format(len(fetch)))
+            await asyncio.gather(*(
+                get_batch(fetch[first:first + dh.ACIS_BATCH])
+                for first in range(0, len(fetch), dh.ACIS_BATCH)))
+            if cache_file:
+                cache.save_json(cache_file, cached)
+
+        for (name, sid) in stations:
+            if sid not in cached:
+                logging.warning("No latlon data for {} ({})".format(name, sid))
+    finally:
+        await queue.put(None)
+
+
 ## make range string for highcharts
 def makeRange(xData, lowdata, highdata):
-    lowdata = lowdata.tolist()
-    highdata = highdata.tolist()
-    current = '['
-    for index, value in enumerate(highdata):
-        temp = '['
-        temp += str(xData[index]) + ',' 
-
-        #conditional 
-        # if lowdata[index] < value :
-        temp += str(lowdata[index]) + ',' 
-        temp += str(value) + ']'
-        current += temp + ','
-    current = current[:-1]
-    current += ']'
-    current = current.replace("nan", "null")
-    return current
+    handle = io.StringIO()
+    writeRange(handle, xData, lowdata, highdata)
+    return handle.getvalue()
+
+## write a highcharts range array [[x, low, high], ...] to a file handle
+def writeRange(handle, xData, lowdata, highdata):
+    handle.write('[')
+    writeRows(handle, xData, lowdata, highdata)
+    handle.write(']')
+
+## write the [x, low, high] rows of a range array, formatting RANGECHUNK rows at a time
+def writeRows(handle, xData, lowdata, highdata):
+    xData, lowdata, highdata = np.asarray(xData), np.asarray(lowdata), np.asarray(highdata)
+    for start in range(0, len(xData), RANGECHUNK):
+        rows = zip(
+            dh.str_values(xData[start:start + RANGECHUNK]),
+            dh.str_values(lowdata[start:start + RANGECHUNK]),
+            dh.str_values(highdata[start:start + RANGECHUNK]))
+        if start:
+            handle.write(',')
+        handle.write('[' + '],['.join(map(','.join, rows)) + ']')
+
+## write the rows of every SERIES range array to buffers {suffix: handle},
+## formatting each column of the event matrix once for all series
+def writeSeries(buffers, xData, events):
+    low_high = [
+        (suffix, EVENTS.index(low), EVENTS.index(high)) for (suffix, low, high) in SERIES]
+    for start in range(0, len(xData), RANGECHUNK):
+        x = dh.str_values(xData[start:start + RANGECHUNK])
+        columns = dh.str_values(events[start:start + RANGECHUNK].T)
+        for (suffix, low, high) in low_high:
+            if start:
+                buffers[suffix].write(',')
+            buffers[suffix].write('[' + '],['.join(map(','.join, zip(x, columns[low], columns[high]))) + ']')
+
+## template variable / file name for a station
+def station_key(station):
+    return ''.join(lett for lett in station if lett.isalnum())
+
+## spool files {suffix: path} of a station's SERIES strings under spool_dir
+def spool_paths(spool_dir, station):
+    return {
+        suffix: os.path.join(spool_dir, '{}.{}'.format(station_key(station), suffix))
+        for (suffix, low, high) in SERIES}
+
+## contents of a spool file
+def read_spool(path):
+    with open(path) as handle:
+        return handle.read()
+
+## write a station's spooled highcharts strings as one json object {suffix: [[x, low, high], ...]}
+def write_payload(path, spool):
+    with open(path, 'w') as handle:
+        for k, (suffix, low, high) in enumerate(SERIES):
+            handle.write(('{' if k == 0 else ',') + json.dumps(suffix) + ':')
+            with open(spool[suffix]) as series:
+                shutil.copyfileobj(series, handle)
+        handle.write('}')
+        instrument.count('bytes_written', handle.tell())
+
+## the SERIES strings of each station in turn for the inline page, read from the
+## spool files {station: {suffix: path}} one series at a time as the page is streamed
+def station_series(spooled, stations):
+    for station in stations:
+        yield (read_spool(spooled[station][suffix]) for (suffix, low, high) in SERIES)
+
+## render template into path piece by piece, generators in template_vars are consumed
+## as the page is written instead of the page being built in memory first
+def write_page(path, template, template_vars):
+    with open(path, 'w') as handle:
+        template.stream(template_vars).dump(handle)
+        instrument.count('bytes_written', handle.tell())
 
 # check if a date is in winter
 def iswinter(somedatetime):
@@ -107,153 +398,499 @@ def iswinter(somedatetime):
         )
 
 
+## iswinter for a whole array of dates (boolean array), from month and day numbers;
+## a time after 0:00 on october 21 is after october 21 as in iswinter. Shared with
+## grid.py, both pass the UTC start of each local day
+def winter_days(dates):
+    values = np.asarray(dates, dtype='datetime64[ns]')
+    days = values.astype('datetime64[D]')
+    months = days.astype('datetime64[M]')
+    monthday = (months.astype(int) % 12 + 1) * 100 + (days - months).astype(int) + 1
+    return (monthday < 321) | (monthday > 1021) | ((monthday == 1021) & (values > days))
+
+
 ## customize ephem library output
-def rise_set(horizon, center, station, lat, lon, dates ):
+def rise_set(horizon, center, station, lat, lon, dates, engine='ephem'):
+    return rise_set_multi([(horizon, center)], station, lat, lon, dates, engine)[0]
+
+
+## next rising or setting after station.date for each horizon, None if circumpolar
+def next_events(station, sun, horizons, altitudes, start_alt, rising, skip=()):
+    # risings go from the lowest target altitude up, settings from the highest down:
+    # if the sun is below (above) the previous target at the start date, the next
+    # event can't come before the previous one, so the search starts from there
+    order = sorted(range(len(horizons)), key=lambda k: altitudes[k], reverse=not rising)
+    events = [None] * len(horizons)
+    previous = None
+    for k in order:
+        if k in skip:
+            continue
+        horizon, center = horizons[k]
+        station.horizon = horizon
+        start = None
+        if previous is not None and events[previous] is not None:
+            if (start_alt < altitudes[previous]) if rising else (start_alt > altitudes[previous]):
+                start = events[previous]
+        try:
+            if rising:
+                events[k] = station.next_rising(sun, start=start, use_center=center)
+            else:
+                events[k] = station.next_setting(sun, start=start, use_center=center)
+        except ephem.CircumpolarError:
+            pass
+        previous = k
+    return events
+
+
+## rise and set times for several (horizon, use_center) pairs in one pass over the dates
+def rise_set_multi(horizons, station, lat, lon, dates, engine='ephem', tolerance=None, check=False):
+    if engine == 'numpy':
+        return rise_set_numpy(horizons, lat, lon, dates)
+
     #ephem library thinks in UTC!
     station.pressure = 0
-    station.horizon = horizon
     station.lat = str(lat)
     station.lon = str(lon) 
-    rises_out = []
-    sets_out = []
-    dates = dates - pd.Timedelta(hours=TIMEZONEOFFSET_H)
-    dates = dates.dt.strftime('%Y/%m/%d %H:%M')
-
-    for ix, row in dates.items():
+    sun = ephem.Sun()
+    utc = (dates - pd.Timedelta(hours=TIMEZONEOFFSET_H)).reset_index(drop=True)
+    # ephem dates (float days) of the start of each day
+    dates = solar.to_dublin(utc)
+
+    #output noon (winter) or midnight (summer) if arctic night or arctic day error ocurrs.
+    #days on which the sun certainly stays below or above a horizon get it without asking ephem
+    fallback = (utc + winter_days(utc) * pd.Timedelta(hours=12)).values.astype('datetime64[ns]')
+    polar = solar.polar_days(
+        lat, dates,
+        [horizon for (horizon, center) in horizons], [center for (horizon, center) in horizons])
+    # rise and set ephem dates, nan where there is no event
+    events = np.full((2, len(horizons), len(dates)), np.nan)
+    calls = 0
+
+    def solve(ix):
+        nonlocal calls
         station.date = dates[ix]
-        try:
-            rises = station.next_rising(ephem.Sun(), use_center=center)
-            sets = station.next_setting(ephem.Sun(), use_center=center)
-
-            rises_out.append(str(rises))
-            sets_out.append(str(sets))
-        #output nan if arctic night or arctic day error ocurrs
-        except ephem.CircumpolarError :
-            thedate_dt = dt.datetime.strptime(dates[ix], '%Y/%m/%d %H:%M') 
-            if iswinter(thedate_dt):
-                rises_out.append((dt.datetime.strptime(dates[ix], '%Y/%m/%d %H:%M') + dt.timedelta(hours=12)).strftime('%Y/%m/%d %H:%M'))
-                sets_out.append((dt.datetime.strptime(dates[ix], '%Y/%m/%d %H:%M') + dt.timedelta(hours=12)).strftime('%Y/%m/%d %H:%M'))
-            else: 
-                rises_out.append(dates[ix])
-                sets_out.append(dates[ix])
-
-    rises_out = pd.DataFrame({'rise': rises_out})    
-    sets_out = pd.DataFrame({'set': sets_out})   
-
-    rises_out = pd.to_datetime(rises_out['rise'], format='%Y/%m/%d %H:%M:%S') + pd.Timedelta(hours=TIMEZONEOFFSET_H)    
-    sets_out = pd.to_datetime(sets_out['set'], format = '%Y/%m/%d %H:%M:%S') + pd.Timedelta(hours=TIMEZONEOFFSET_H)
+        sun.compute(station)
+        # altitude of the sun's center at each event
+        altitudes = [
+            ephem.degrees(horizon) - (0 if center else sun.radius)
+            for (horizon, center) in horizons]
+        start_alt = sun.alt
+        known = [k for k in range(len(horizons)) if polar[k, ix]]
+        rises = next_events(station, sun, horizons, altitudes, start_alt, rising=True, skip=known)
+        # no need to look for a setting where there is no rising
+        skip = [k for k in range(len(horizons)) if rises[k] is None]
+        sets = next_events(
+            station, sun, horizons, altitudes, start_alt, rising=False, skip=skip)
+        calls += 1 + 2 * len(horizons) - len(known) - len(skip)
+
+        for k in range(len(horizons)):
+            if rises[k] is not None and sets[k] is not None:
+                events[0, k, ix] = rises[k]
+                events[1, k, ix] = sets[k]
+
+    if tolerance is None:
+        for ix in np.flatnonzero(~polar.all(axis=0)):
+            solve(ix)
+    else:
+        guide_rises, guide_sets, guide_polar = solar.rise_set(
+            lat, lon, dates,
+            [horizon for (horizon, center) in horizons], [center for (horizon, center) in horizons])
+        solved = fill_adaptive(
+            events, solve, dates, np.stack([guide_rises, guide_sets]),
+            guide_polar | polar, tolerance)
+        instrument.count('adaptive_days', len(dates))
+        instrument.count('adaptive_solved_days', solved)
+        if check:
+            adaptive = events.copy()
+            for ix in range(len(dates)):
+                solve(ix)
+            error = np.abs(np.nan_to_num(adaptive - events)).max(initial=0) * 86400
+            if (np.isnan(adaptive) != np.isnan(events)).any():
+                error = np.inf
+            instrument.maximum('adaptive_max_error_s', error)
+            logging.debug("adaptive rise/set at {}, {}: max error {:.1f} s".format(lat, lon, error))
+            events = adaptive
+
+    fallbacks = int(np.isnan(events[0]).sum())
+    instrument.count('ephem_calls', calls)
+    instrument.count('polar_index_days', polar.sum())
+    instrument.count('circumpolar_fallbacks', fallbacks)
+
+    #all events to datetime64 at once, keeping EVENTPRECISION of the ephem dates
+    with instrument.span('pandas_conversion'):
+        times = np.where(
+            np.isnan(events), fallback,
+            solar.from_dublin(np.nan_to_num(events), EVENTPRECISION))
+        times += np.timedelta64(TIMEZONEOFFSET_H, 'h')
+        results = [
+            (pd.Series(times[0, k], name='rise'), pd.Series(times[1, k], name='set'))
+            for k in range(len(horizons))]
 
     #return times in akst, i.e. utc - 9 hours
-    return (rises_out, sets_out)
+    return results
+
+
+## adaptive sampling for rise_set_multi: solve(ix) fills events[..., ix] exactly for a
+## few days. In between, events are the guide (the numpy engine's events for the same
+## start dates) plus the guide's error interpolated from the solved days, which is
+## close to constant. Each interval is checked at ADAPTIVESAMPLES - 1 evenly spaced
+## days and split while one of them is more than tolerance seconds off the line
+## between its ends, or the guide or the solved days are circumpolar at some days and
+## not at others; accepted intervals interpolate through all their solved days. Days
+## where a guide event lies within ADAPTIVEEDGE seconds of the start date or a day
+## after it may be a different event than the one ephem finds, and the error changes
+## fast within ADAPTIVEPOLAR days of a polar transition, so those days are always
+## solved. The tolerance holds at the checked days only, a change of the error that
+## falls between them goes unnoticed (--check-tolerance measures the real error).
+## Returns the number of days solved.
+def fill_adaptive(events, solve, start, guide, guide_polar, tolerance, step=ADAPTIVESTEP):
+    days = events.shape[-1]
+    tolerance = tolerance / 86400.
+    edge = ADAPTIVEEDGE / 86400.
+    solved = np.zeros(days, dtype=bool)
+
+    def exact(ix):
+        if not solved[ix]:
+            solve(ix)
+            solved[ix] = True
+
+    offset = np.where(guide_polar, 0.5, guide - start)
+    risky = ((offset < edge) | (np.abs(offset - 1) < edge)).any(axis=(0, 1))
+    changes = np.flatnonzero((np.diff(guide_polar, axis=-1)).any(axis=0))
+    for ix in changes:
+        risky[max(ix - ADAPTIVEPOLAR + 1, 0):ix + ADAPTIVEPOLAR + 1] = True
+    edges = sorted(set(range(0, days, step)) | {days - 1} | set(np.flatnonzero(risky)))
+    for ix in edges:
+        exact(ix)
+    intervals = list(zip(edges[:-1], edges[1:]))
+    while intervals:
+        a, b = intervals.pop()
+        if b - a < 2:
+            continue
+        checks = sorted(set(a + (b - a) * np.arange(1, ADAPTIVESAMPLES) // ADAPTIVESAMPLES) - {a, b})
+        for ix in checks:
+            exact(ix)
+        error = events[..., [a, b]] - guide[..., [a, b]]
+        weights = (np.array(checks) - a) / (b - a)
+        line = guide[..., checks] + error[..., :1] * (1 - weights) + error[..., 1:] * weights
+        split = (
+            (guide_polar[:, a:b + 1] != guide_polar[:, a, None]).any()
+            or (np.isnan(events[..., checks + [b]]) != np.isnan(events[..., a, None])).any()
+            or np.nan_to_num(np.abs(line - events[..., checks])).max() > tolerance)
+        if split:
+            m = (a + b) // 2
+            exact(m)
+            intervals += [(a, m), (m, b)]
+            continue
+        known = np.flatnonzero(solved[a:b + 1]) + a
+        inside = np.flatnonzero(~solved[a:b + 1]) + a
+        error = events[..., known] - guide[..., known]
+        for index in np.ndindex(events.shape[:-1]):
+            events[index + (inside,)] = guide[index + (inside,)] + np.interp(inside, known, error[index])
+    return int(solved.sum())
+
+
+## same output as rise_set_multi, computed for all dates and horizons at once by solar.py
+def rise_set_numpy(horizons, lat, lon, dates):
+    dates = (dates - pd.Timedelta(hours=TIMEZONEOFFSET_H)).reset_index(drop=True)
+    rises, sets, circumpolar = solar.rise_set(
+        lat, lon, solar.to_dublin(dates),
+        [horizon for (horizon, center) in horizons],
+        [center for (horizon, center) in horizons])
+    instrument.count('circumpolar_fallbacks', circumpolar.sum())
+
+    #arctic night or arctic day: noon in winter, midnight in summer
+    fallback = (dates + winter_days(dates) * pd.Timedelta(hours=12)).dt.floor('min')
+
+    results = []
+    for k in range(len(horizons)):
+        rises_out = fallback.where(circumpolar[k], solar.from_dublin(rises[k]))
+        sets_out = fallback.where(circumpolar[k], solar.from_dublin(sets[k]))
+        results.append((
+            (rises_out + pd.Timedelta(hours=TIMEZONEOFFSET_H)).rename('rise'),
+            (sets_out + pd.Timedelta(hours=TIMEZONEOFFSET_H)).rename('set')))
+    return results
+
+
+## rise_set_multi, looking up each (horizon, use_center) table in result_cache first
+def rise_set_cached(
+        horizons, station, lat, lon, dates, engine='ephem', result_cache=None,
+        tolerance=None, check=False):
+    if result_cache is None or check:
+        return rise_set_multi(horizons, station, lat, lon, dates, engine, tolerance, check)
+
+    values = dates.values.astype('datetime64[ns]')
+    method = engine if tolerance is None or engine == 'numpy' else '{}~{}'.format(engine, tolerance)
+    keys = [
+        result_cache.key(RESULTS_VERSION, method, lat, lon, horizon, center, TIMEZONEOFFSET_H, values)
+        for (horizon, center) in horizons]
+    tables = [result_cache.get(key) for key in keys]
+    missing = [k for k in range(len(horizons)) if tables[k] is None]
+    instrument.count('table_cache_hits', len(horizons) - len(missing))
+    instrument.count('table_cache_misses', len(missing))
+    if missing:
+        results = rise_set_multi(
+            [horizons[k] for k in missing], station, lat, lon, dates, engine, tolerance)
+        for k, (rises, sets) in zip(missing, results):
+            tables[k] = np.stack([
+                rises.values.astype('datetime64[ns]'), sets.values.astype('datetime64[ns]')])
+            result_cache.put(keys[k], tables[k])
+    return [
+        (pd.Series(table[0], name='rise'), pd.Series(table[1], name='set'))
+        for table in tables]
+
+
+## daily dates from start to end, CHUNKDAYS at a time
+def iter_dates(start, end, chunk_days=CHUNKDAYS):
+    start = pd.Timestamp(start).normalize()
+    end = pd.Timestamp(end).normalize()
+    while start <= end:
+        stop = min(start + pd.Timedelta(days=chunk_days - 1), end)
+        yield pd.Series(pd.date_range(start=start, end=stop))
+        start = stop + pd.Timedelta(days=1)
+
+
+## rise/set times of one station for a chunk of dates, observer is an ephem.Observer to reuse
+def station_times(
+        lat, lon, dates, engine='ephem', result_cache=None, tolerance=None, check=False,
+        observer=None):
+    times = pd.DataFrame({'dates': dates})
+    stationObs = ephem.Observer() if observer is None else observer
+    results = rise_set_cached(
+        [(horizon, center) for (rise_col, set_col, horizon, center) in HORIZONS], stationObs,
+        lat, lon, times['dates'], engine, result_cache, tolerance, check)
+    for (rise_col, set_col, horizon, center), (rises, sets) in zip(HORIZONS, results):
+        times[rise_col], times[set_col] = rises, sets
+    return times
+
+
+## milliseconds of day of every event for highcharts, one transform for all columns:
+## int64 array of shape (days, len(EVENTS)), settings before noon are moved to the next day
+def event_matrix(times):
+    columns = EVENTS[:-2]
+    values = tables.round_seconds(times[columns].values)
+    events = np.empty((len(values), len(EVENTS)), dtype='int64')
+    events[:, :-2] = (values.astype('datetime64[s]') - values.astype('datetime64[D]')).astype('int64') * 1000
+
+    #this adds a day if sunset is before noon
+    sets = [EVENTS.index(set_col) for (rise_col, set_col, horizon, center) in HORIZONS]
+    events[:, sets] += np.where(events[:, sets] < DAY_MS // 2, DAY_MS, 0)
+
+    events[:, -2] = 0
+    events[:, -1] = DAY_MS - 1
+    return events
+
+
+## day of year in milliseconds for the x axis, first_day is the number of days before this chunk
+def day_numbers(days, first_day=0):
+    return (np.arange(days, dtype='int64') + first_day + 1) * DAY_MS
+
+
+## times of one station, streamed chunk by chunk into the rows of the table file,
+## returns the highcharts strings if render is set, or with spool_dir the paths
+## of the files (spool_paths) they were written to
+def generate_station(
+        station, lat, lon, start, end, engine='ephem', result_cache=None,
+        table_path=None, rows=(), render=True, chunk_days=CHUNKDAYS, tolerance=None, check=False,
+        spool_dir=None):
+    with instrument.span('station', station):
+        return _generate_station(
+            station, lat, lon, start, end, engine, result_cache, table_path, rows, render, chunk_days,
+            tolerance, check, spool_dir)
+
+
+def _generate_station(
+        station, lat, lon, start, end, engine, result_cache, table_path, rows, render, chunk_days,
+        tolerance, check, spool_dir):
+    logging.debug("generating items for {}".format(station))
+    columns = [column for item in HORIZONS for column in item[:2]]
+    if table_path:
+        header, table = tables.read_tables(table_path, mode='r+')
+    if render and spool_dir:
+        spool = spool_paths(spool_dir, station)
+        buffers = {suffix: open(path, 'w') for (suffix, path) in spool.items()}
+    else:
+        buffers = {suffix: io.StringIO() for (suffix, low, high) in SERIES}
+
+    day = 0
+    for dates in iter_dates(start, end, chunk_days):
+        with instrument.span('rise_set'):
+            times = station_times(lat, lon, dates, engine, result_cache, tolerance, check)
+        if table_path:
+            with instrument.span('table_write'):
+                values = tables.seconds_since(times['dates'], times[columns])
+                for row in rows:
+                    table[row, day:day + len(times)] = values
+                table.flush()
+            instrument.count('bytes_written', values.nbytes * len(rows))
+        if render:
+            # make strings to pass to highcharts. format: [xData, yData low end of range, yData high end of range]
+            with instrument.span('seconds'):
+                events = event_matrix(times)
+            with instrument.span('serialize'):
+                for handle in buffers.values():
+                    handle.write(',' if day else '[')
+                writeSeries(buffers, day_numbers(len(events), day), events)
+        day += len(times)
+
+    if table_path:
+        del table
+    if not render:
+        return None
+    if spool_dir:
+        for handle in buffers.values():
+            handle.write(']')
+            instrument.count('bytes_written', handle.tell())
+            handle.close()
+        return spool
+    return {suffix: buffers[suffix].getvalue() + ']' for (suffix, low, high) in SERIES}
+
+
+## run generate_station in executor for the stations arriving on queue, as soon as they arrive.
+## Stations at the same coordinates (e.g. two names for one ACIS id) are computed once,
+## options are passed on to generate_station. Returns {station: result}; the workers'
+## instrument stats are merged into this process.
+async def generate_stream(queue, executor, stations, options):
+    loop = asyncio.get_running_loop()
+    rows = {name: k for (k, name) in enumerate(stations)}
+    locations = {}
+    futures = {}
+    while True:
+        batch = await queue.get()
+        if batch is None:
+            break
+        new = {}
+        for (name, lat, lon) in batch:
+            locations.setdefault((lat, lon), [])
+            (locations if (lat, lon) in futures else new).setdefault((lat, lon), []).append(name)
+        for ((lat, lon), names) in new.items():
+            futures[(lat, lon)] = loop.run_in_executor(executor, functools.partial(
+                instrument.collect, generate_station, ', '.join(names), lat, lon,
+                rows=[rows[name] for name in names], **options))
+            locations[(lat, lon)] = list(names)
+
+    results = {}
+    for location, (result, stats) in zip(futures, await asyncio.gather(*futures.values())):
+        results[location] = result
+        instrument.merge(stats)
+
+    #stations that arrived after their location was started get a copy of its table rows
+    table_path = options.get('table_path')
+    if table_path:
+        header, table = tables.read_tables(table_path, mode='r+')
+        for location, names in locations.items():
+            for name in names[1:]:
+                table[rows[name]] = table[rows[names[0]]]
+        table.flush()
+        del table
+    return {name: results[location] for (location, names) in locations.items() for name in names}
+
+
+## fetch station coordinates and compute the stations at the same time
+async def run_pipeline(executor, stations, options, **acis_options):
+    queue = asyncio.Queue()
+    producer = asyncio.ensure_future(stream_acis_stn_latlon(queue, **acis_options))
+    strings = await generate_stream(queue, executor, stations, options)
+    await producer
+    return strings
 
 
 if __name__ == '__main__':
     """Main script"""
 
-    logging.debug("Loading templates")
-    template = load_template()
-
     logging.debug("Parsing arguments")
     args = parse_arguments()
+    started = time.perf_counter()
+    if args.cprofile:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+
+    if args.render != 'none':
+        logging.debug("Loading templates")
+        with instrument.span('template_load'):
+            template = load_template(
+                templatefn=LAZYTEMPLATEFN if args.render == 'lazy' else TEMPLATEFN, cache_dir=args.cache_dir)
 
     # set output directory
     output_dir = args.dir
     if not os.path.isdir(output_dir):
         os.makedirs(output_dir)
 
+    stations = [name for (name, sid) in ws.registry.select(int(args.type))]
+
+    result_cache = None
+    if args.cache_size > 0:
+        result_cache = cache.ResultCache(
+            os.path.join(args.cache_dir, TABLECACHEDIR), int(args.cache_size * 2**20))
+
+    #rise/set times of all stations in one memory mappable file, filled in by the workers
+    #(rows of stations without coordinates stay missing)
+    table_path = None
+    if stations:
+        table_path = os.path.join(output_dir, TABLESFN)
+        days = len(pd.date_range(start=pd.Timestamp(args.start).normalize(), end=pd.Timestamp(args.end).normalize()))
+        table = tables.create_tables(
+            table_path, stations, [column for item in HORIZONS for column in item[:2]],
+            args.start, days, TIMEZONEOFFSET_H)
+        del table
+
+    #the highcharts strings go to files as each station completes, so the stations
+    #that finished before the page is written don't have to be held in memory
+    spool = None
+    if args.render != 'none':
+        spool = tempfile.TemporaryDirectory(prefix=SPOOLPREFIX, dir=output_dir)
+
+    #generate times while station data is still coming in from ACIS,
+    #spread over worker processes if asked to
     logging.debug("Starting to retrieve station data from ACIS")
-    meta = get_acis_stn_latlon(stationtype=int(args.type))
-    stations = meta.keys()
-    daterange = pd.date_range(start= '2018-01-01 00:00', end = '2018-12-31 00:00')
-
-    times = {}
-    for station in stations: 
-        times[station] = pd.DataFrame(columns=['dates'])
-        times[station]['dates'] = pd.date_range(start='2018-01-01 00:00', end='2018-12-31 23:59')
-
-    logging.debug("Starting work on template variables")
-
-    string_date = {}
-    string_day = {}
-    string_civilAM = {}
-    string_civilPM = {}
-    string_nautAM = {}
-    string_nautPM = {}
-    string_astrAM = {}
-    string_astrPM = {}
-    string_nightAM = {}
-    string_nightPM = {}
-
-    seconds = {}
-
-    #generate times
-    for station in stations:
-        stationObs = ephem.Observer()
-
-        logging.debug("generating items for {}".format(station))
-        times[station]['sunrise'], times[station]['sunset'] = rise_set(
-            horizonDay, False, stationObs, 
-            meta[station]['lat'], meta[station]['lon'], times[station]['dates'])
-        times[station]['civil_rise'], times[station]['civil_set'] = rise_set(
-            horizonCivil, True, stationObs, 
-            meta[station]['lat'], meta[station]['lon'], times[station]['dates'])
-        times[station]['naut_rise'], times[station]['naut_set'] = rise_set(
-            horizonNautical, True, stationObs, 
-            meta[station]['lat'], meta[station]['lon'], times[station]['dates'])
-        times[station]['astr_rise'], times[station]['astr_set'] = rise_set(
-            horizonAstronomical, True, stationObs, 
-            meta[station]['lat'], meta[station]['lon'], times[station]['dates'])
-            
-        times[station].to_csv(os.path.join("testdir", ''.join(lett for lett in station if lett.isalnum())), sep='\t')
-        seconds[station] = pd.DataFrame(columns = times[station].columns)
-
-        #convert time values to number of milliseconds in day (this is what highcharts wants)
-        for column in times[station].columns:
-
-            seconds[station][column] = times[station][column].dt.hour * 3600 + times[station][column].dt.minute * 60 + times[station][column].dt.second
-            seconds[station][column] = seconds[station][column] * 1000
-
-            #this adds a day if sunset is before noon
-            seconds[station].loc[seconds[station]['civil_set'] < 12 * 3600 * 1000, 'civil_set'] = seconds[station]['civil_set'] + 24 * 3600 * 1000
-            seconds[station].loc[seconds[station]['naut_set'] < 12 * 3600 * 1000, 'naut_set'] = seconds[station]['naut_set'] + 24 * 3600 * 1000
-            seconds[station].loc[seconds[station]['astr_set'] < 12 * 3600 * 1000, 'astr_set'] = seconds[station]['astr_set'] + 24 * 3600 * 1000
-            seconds[station].loc[seconds[station]['sunset'] < 12 * 3600 * 1000, 'sunset'] = seconds[station]['sunset'] + 24 * 3600 * 1000
-
-        #day of year in millisecons for x axis
-        seconds[station]['num'] = (seconds[station].index + 1) * 24 * 3600 * 1000
-
-    ## various attempts to fiddle with settings to fix the gaps
-        AM = seconds[station]['astr_rise'].min()
-        PM = seconds[station]['astr_set'].max()
-
-        seconds[station]['zeroAM'] = 0
-        seconds[station]['zeroPM'] = (24 * 3600 * 1000) - 1
-        # make strings to pass to highcharts. format: [xData, yData low end of range, yData high end of range]
-        string_day[station] = makeRange(seconds[station]['num'], seconds[station]['sunrise'], seconds[station]['sunset'])
-        string_civilAM[station] = makeRange(seconds[station]['num'], seconds[station]['civil_rise'], seconds[station]['sunrise'])
-        string_civilPM[station] = makeRange(seconds[station]['num'], seconds[station]['sunset'], seconds[station]['civil_set'])
-        string_nautAM[station] = makeRange(seconds[station]['num'], seconds[station]['naut_rise'], seconds[station]['civil_rise'])
-        string_nautPM[station] = makeRange(seconds[station]['num'], seconds[station]['civil_set'], seconds[station]['naut_set'])
-        string_astrAM[station] = makeRange(seconds[station]['num'], seconds[station]['astr_rise'], seconds[station]['naut_rise'])
-        string_astrPM[station] = makeRange(seconds[station]['num'], seconds[station]['naut_set'], seconds[station]['astr_set'])
-        string_nightAM[station] = makeRange(seconds[station]['num'], seconds[station]['zeroAM'], seconds[station]['astr_rise'])
-        string_nightPM[station] = makeRange(seconds[station]['num'], seconds[station]['astr_set'], seconds[station]['zeroPM'])
+    options = {
+        'start': args.start, 'end': args.end, 'engine': args.engine,
+        'result_cache': result_cache, 'table_path': table_path,
+        'render': args.render != 'none', 'chunk_days': args.chunk_days,
+        'tolerance': args.tolerance_seconds, 'check': args.check_tolerance,
+        'spool_dir': spool.name if spool else None}
+    if args.jobs > 1:
+        executor = concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs)
+    else:
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=1)
+    with executor, instrument.span('pipeline'):
+        spooled = asyncio.run(run_pipeline(
+            executor, stations, options,
+            acis_station_url=args.acis_url, stationtype=int(args.type),
+            cache_file=os.path.join(args.cache_dir, METACACHEFN),
+            ttl_days=args.meta_ttl, offline=args.offline))
+    if result_cache is not None:
+        result_cache.evict()
+    stations = [station for station in stations if station in spooled]
 
     #build variable to give to highcharts
     template_vars = {}
-    for station in stations:
-        name = ''.join(lett for lett in station if lett.isalnum())
-        template_vars[name + 'Day'] = string_day[station]
-        template_vars[name + 'Civil_twilight_AM'] = string_civilAM[station]
-        template_vars[name + 'Civil_twilight_PM'] = string_civilPM[station]
-        template_vars[name + 'Nautical_twilight_AM'] = string_nautAM[station]
-        template_vars[name + 'Nautical_twilight_PM'] = string_nautPM[station]
-        template_vars[name + 'Astro_twilight_AM'] = string_astrAM[station]
-        template_vars[name + 'Astro_twilight_PM'] = string_astrPM[station]
-        template_vars[name + 'Night_AM'] = string_nightAM[station]
-        template_vars[name + 'Night_PM'] = string_nightPM[station]
-
-    #pass to highcharts template
-    output_file = os.path.join(output_dir, OUTPUTFN)
-    with open(output_file, 'w') as handle:
-        handle.write(template.render(template_vars))
+    if args.render == 'lazy':
+        os.makedirs(os.path.join(output_dir, DATADIR), exist_ok=True)
+        with instrument.span('payloads'):
+            for station in stations:
+                write_payload(
+                    os.path.join(output_dir, DATADIR, station_key(station) + '.json'), spooled[station])
+        template_vars['stations'] = [
+            {'name': station, 'file': station_key(station)} for station in stations]
+        template_vars['series'] = [suffix for (suffix, low, high) in SERIES]
+        template_vars['datadir'] = DATADIR
+    elif args.render == 'inline':
+        template_vars['stations'] = stations
+        template_vars['data'] = station_series(spooled, stations)
+
+    #pass to highcharts template, streamed to the file
+    if args.render != 'none':
+        with instrument.span('render'):
+            write_page(os.path.join(output_dir, OUTPUTFN), template, template_vars)
+        spool.cleanup()
+
+    if args.cprofile:
+        profiler.disable()
+        profiler.dump_stats(args.cprofile)
+    if args.profile:
+        instrument.write_report(
+            args.profile, args=vars(args), stations=len(stations),
+            wall_seconds=time.perf_counter() - started)
+        logging.debug("Profile written to {}".format(args.profile))
@@ -0,0 +1,287 @@
+#! /usr/bin/env python3
+# Benchmarks for the hot paths of NightAndDay.py and data_helpers.py
+#
+# Runs without network: stations get fixed coordinates and StnMeta is answered
+# by a fake_acis.py server on localhost. Every stage is timed (best of
+# --repeat runs) for 1, 20 and 200 stations and run once more under
+# tracemalloc for its peak memory. Stages faster than MINTIME are looped
+# (like timeit) and reported per call. Results can be saved as a baseline
+# json and later runs compared against it; a stage slower than --threshold
+# times its baseline is reported and makes the script exit with 1.
+# Baselines only compare on the machine that wrote them.
+#
+#   python benchmark.py --save              # write benchmark_baseline.json
+#   python benchmark.py                     # compare against it
+
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+import ephem
+import pandas as pd
+# load ACRC modules
+import NightAndDay as nd
+import data_helpers as dh
+import stations as ws
+import fake_acis
+import climate
+
+## configuration
+BASELINEFN = os.path.join(nd.PATH, 'benchmark_baseline.json')
+SIZES = (1, 20, 200)
+REPEAT = 3
+# short stages are looped until one timed run takes at least MINTIME seconds
+MINTIME = 0.2
+THRESHOLD = 1.5
+YEAR = 2018
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='time the daylight and climate helpers offline')
+    parser.add_argument(
+        "--sizes", help="comma separated numbers of stations",
+        default=','.join(str(size) for size in SIZES))
+    parser.add_argument(
+        "--engine", help="rise/set engine", choices=nd.ENGINES, default='ephem')
+    parser.add_argument(
+        "--repeat", help="timed runs per stage, the best one counts", type=int, default=REPEAT)
+    parser.add_argument(
+        "--stages", help="comma separated stages to run (default all)")
+    parser.add_argument(
+        "--baseline", help="baseline json to compare against or save to", default=BASELINEFN)
+    parser.add_argument(
+        "--save", help="save the results as the new baseline", action='store_true')
+    parser.add_argument(
+        "--threshold", help="report stages slower than threshold times the baseline",
+        type=float, default=THRESHOLD)
+    return parser.parse_args()
+
+
+## first size stations of type 4 with fixed made up coordinates: [(name, sid, lat, lon)]
+def bench_stations(size):
+    selected = ws.registry.select(4)[:size]
+    return [(name, sid) + tuple(fake_acis.station_ll(sid)[::-1]) for (name, sid) in selected]
+
+
+## fake ACIS daily data of one station for a year, as the lists ACIS returns
+def daily_data(sid, year=YEAR):
+    dates = pd.date_range('{}-01-01'.format(year), '{}-12-31'.format(year)).date
+    return {
+        elem: [fake_acis.daily_value(sid, elem, date) for date in dates]
+        for elem in ('maxt', 'mint', 'pcpn')}
+
+
+## inputs shared by the stages of one size, computed once outside the timings
+class Fixture:
+    def __init__(self, size, engine):
+        self.engine = engine
+        self.stations = bench_stations(size)
+        self.dates = pd.Series(pd.date_range('{}-01-01'.format(YEAR), '{}-12-31'.format(YEAR)))
+        self.times = [
+            nd.station_times(lat, lon, self.dates, engine)
+            for (name, sid, lat, lon) in self.stations]
+        self.events = [nd.event_matrix(times) for times in self.times]
+        self.num = nd.day_numbers(len(self.dates))
+        self.strings = [self.series(events) for events in self.events]
+        self.daily = [daily_data(sid) for (name, sid, lat, lon) in self.stations]
+        self.sids = [sid for (name, sid, lat, lon) in self.stations]
+        self.month = fake_acis.multi_stn_data({
+            'sids': ','.join(self.sids), 'sdate': '{}-01-01'.format(YEAR),
+            'edate': '{}-01-31'.format(YEAR), 'elems': climate.ELEMS}, {})
+
+    def series(self, events):
+        return {
+            suffix: nd.makeRange(
+                self.num, events[:, nd.EVENTS.index(low)], events[:, nd.EVENTS.index(high)])
+            for (suffix, low, high) in nd.SERIES}
+
+
+def stage_stnmeta(fixture):
+    coords = {sid: [lon, lat] for (name, sid, lat, lon) in fixture.stations}
+    server = fake_acis.serve(coords=coords)
+    try:
+        url = 'http://{}:{}/StnMeta?'.format(*server.server_address)
+        ids = ','.join(sorted(coords))
+
+        def run():
+            dh.read_batched(url, {'sids': ids, 'meta': 'll,sids'})
+        yield run
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def stage_rise_set(fixture, horizon, center):
+    def run():
+        for (name, sid, lat, lon) in fixture.stations:
+            nd.rise_set(horizon, center, ephem.Observer(), lat, lon, fixture.dates, fixture.engine)
+    yield run
+
+
+def stage_seconds(fixture):
+    def run():
+        for times in fixture.times:
+            nd.event_matrix(times)
+    yield run
+
+
+def stage_makerange(fixture):
+    def run():
+        for events in fixture.events:
+            fixture.series(events)
+    yield run
+
+
+def stage_makestring(fixture):
+    def run():
+        for events in fixture.events:
+            for column in events.T:
+                dh.makeString(column)
+    yield run
+
+
+def stage_proc_acis(fixture):
+    def run():
+        for daily in fixture.daily:
+            for elem in ('maxt', 'mint'):
+                dh.proc_acis(daily[elem], 'int')
+            dh.proc_acis(daily['pcpn'], 'float')
+    yield run
+
+
+def stage_month_high_low(fixture):
+    months = pd.date_range('{}-01-01'.format(YEAR), periods=12, freq='MS')
+
+    def run():
+        for daily in fixture.daily:
+            for month in months:
+                first = month.dayofyear - 1
+                last = first + month.days_in_month
+                dh.month_high_low([None, daily['maxt'][first:last], daily['mint'][first:last]])
+    yield run
+
+
+def stage_month_summary(fixture):
+    def run():
+        climate.render(climate.summarize(climate.to_array(fixture.month, fixture.sids, 31)))
+    yield run
+
+
+def stage_render(fixture):
+    template = nd.load_template()
+    names = [name for (name, sid, lat, lon) in fixture.stations]
+    # the page is rendered from spool files like NightAndDay.py writes them
+    with tempfile.TemporaryDirectory(prefix=nd.SPOOLPREFIX) as spool_dir:
+        spooled = {}
+        for name, strings in zip(names, fixture.strings):
+            spooled[name] = nd.spool_paths(spool_dir, name)
+            for suffix, path in spooled[name].items():
+                with open(path, 'w') as handle:
+                    handle.write(strings[suffix])
+
+        def run():
+            nd.write_page(os.devnull, template, {
+                'stations': names, 'data': nd.station_series(spooled, names)})
+        yield run
+
+
+STAGES = [
+    ('stnmeta', stage_stnmeta),
+] + [
+    ('rise_set_{}'.format(rise_col.split('_')[0].replace('sunrise', 'day')),
+     lambda fixture, horizon=horizon, center=center: stage_rise_set(fixture, horizon, center))
+    for (rise_col, set_col, horizon, center) in nd.HORIZONS
+] + [
+    ('seconds', stage_seconds),
+    ('makeRange', stage_makerange),
+    ('makeString', stage_makestring),
+    ('proc_acis', stage_proc_acis),
+    ('month_high_low', stage_month_high_low),
+    ('month_summary', stage_month_summary),
+    ('render', stage_render),
+]
+
+
+## seconds taken by number calls of run
+def timed(run, number):
+    start = time.perf_counter()
+    for _ in range(number):
+        run()
+    return time.perf_counter() - start
+
+
+## best time per call of repeat runs and tracemalloc peak of one more call
+def measure(stage, fixture, repeat):
+    setup = stage(fixture)
+    run = next(setup)
+    try:
+        number = 1
+        elapsed = timed(run, number)
+        while elapsed < MINTIME:
+            number *= 2 if elapsed * 2 >= MINTIME else max(2, int(MINTIME / max(elapsed, 1e-6)))
+            elapsed = timed(run, number)
+        best = elapsed / number
+        for _ in range(repeat - 1):
+            best = min(best, timed(run, number) / number)
+        tracemalloc.start()
+        try:
+            run()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    finally:
+        setup.close()
+    return {'seconds': best, 'peak_bytes': peak}
+
+
+## compare results with a baseline, returns the regressed keys
+def compare(results, baseline, threshold):
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        ratio = result['seconds'] / max(baseline[key]['seconds'], 1e-9)
+        if ratio > threshold:
+            regressions.append(key)
+        print('{:32s} {:7.2f}x time {:7.2f}x peak{}'.format(
+            key, ratio, result['peak_bytes'] / max(baseline[key]['peak_bytes'], 1),
+            '  REGRESSION' if ratio > threshold else ''))
+    return regressions
+
+
+if __name__ == '__main__':
+    """Run the benchmarks"""
+    logging.getLogger().setLevel(logging.WARNING)
+    args = parse_arguments()
+    wanted = set(args.stages.split(',')) if args.stages else None
+
+    results = {}
+    for size in [int(size) for size in args.sizes.split(',')]:
+        fixture = Fixture(size, args.engine)
+        for (name, stage) in STAGES:
+            if wanted and name not in wanted:
+                continue
+            key = '{}/{}/{}'.format(name, args.engine if name.startswith('rise_set') else 'any', size)
+            results[key] = measure(stage, fixture, args.repeat)
+            print('{:32s} {:9.4f} s {:9.1f} KiB peak'.format(
+                key, results[key]['seconds'], results[key]['peak_bytes'] / 1024))
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as handle:
+            baseline = json.load(handle)
+    regressions = []
+    if baseline and not args.save:
+        print('\ncompared to {}'.format(args.baseline))
+        regressions = compare(results, baseline, args.threshold)
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline, 'w') as handle:
+            json.dump(baseline, handle, indent=1, sort_keys=True)
+        print('\nbaseline saved to {}'.format(args.baseline))
+    sys.exit(1 if regressions else 0)
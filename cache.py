@@ -0,0 +1,98 @@
+# On-disk caches used by NightAndDay.py
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import numpy as np
+
+
+## read a json cache file, empty if it does not exist or can't be read
+def load_json(path):
+    try:
+        with open(path) as handle:
+            return json.load(handle)
+    except FileNotFoundError:
+        return {}
+    except ValueError:
+        logging.warning("Ignoring unreadable cache file {}".format(path))
+        return {}
+
+
+## write a json cache file, replacing the old one only once the new one is complete
+def save_json(path, data):
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    handle, tmpname = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    try:
+        with os.fdopen(handle, 'w') as tmpfile:
+            json.dump(data, tmpfile, indent=1, sort_keys=True)
+        os.replace(tmpname, path)
+    except BaseException:
+        os.remove(tmpname)
+        raise
+
+
+## computed tables stored under a hash of their inputs
+class ResultCache:
+    """Directory of .npy tables named after a hash of the inputs that produced them
+
+    Files are touched when read; evict() removes the least recently used ones
+    until the directory is back under max_bytes.
+    """
+    def __init__(self, directory, max_bytes=256 * 2**20):
+        self.directory = directory
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def key(*inputs):
+        digest = hashlib.sha256()
+        for item in inputs:
+            if isinstance(item, np.ndarray):
+                digest.update(item.tobytes())
+            else:
+                digest.update(json.dumps(item).encode())
+            digest.update(b'\0')
+        return digest.hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key + '.npy')
+
+    def get(self, key):
+        path = self.path(key)
+        try:
+            table = np.load(path)
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        return table
+
+    def put(self, key, table):
+        os.makedirs(self.directory, exist_ok=True)
+        handle, tmpname = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            with os.fdopen(handle, 'wb') as tmpfile:
+                np.save(tmpfile, table)
+            os.replace(tmpname, self.path(key))
+        except BaseException:
+            os.remove(tmpname)
+            raise
+
+    def evict(self):
+        if not os.path.isdir(self.directory):
+            return
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.npy'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for (mtime, size, path) in entries)
+        for (mtime, size, path) in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
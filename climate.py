@@ -0,0 +1,157 @@
+#! /usr/bin/env python3
+# Monthly climate summaries for all selected stations at once
+#
+# Daily maxt, mint and pcpn of the month and their 1981-2010 daily normals
+# come from ACIS MultiStnData, ACIS_BATCH stations per request. The values
+# of all stations are parsed into one masked array of shape
+# (stations, days, elements) with data_helpers.acis_array, so mean
+# temperatures, extremes with their dates and precipitation departures of
+# every station-month come out of a few numpy reductions. The build_info
+# tables are rendered in bulk (data_helpers.build_infos) into one html file.
+# With --cube the month is read from a local climate cube (cube.py) instead,
+# which only fetches the days it does not hold yet.
+#
+#   python climate.py 2019-01 outdir --type 4
+
+import argparse
+import html
+import logging
+import os
+import numpy as np
+# load ACRC modules
+import data_helpers as dh
+import stations as ws
+import instrument
+import cube
+
+## configuration
+OUTPUTFN = 'climate_{}.html'
+# daily elements requested for every station: observations, then normals,
+# and their variable names in a climate cube
+ELEMS = [
+    {'name': 'maxt'}, {'name': 'mint'}, {'name': 'pcpn'},
+    {'name': 'avgt', 'normal': '1'}, {'name': 'pcpn', 'normal': '1'}]
+NAMES = ['maxt', 'mint', 'pcpn', 'avgt_normal', 'pcpn_normal']
+# inches counted for a trace of precipitation
+TRACE = 0.0
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='monthly climate summaries of all stations of a type')
+    parser.add_argument(
+        "month", help="month (YYYY-MM)")
+    parser.add_argument(
+        "dir", help="name of output directory")
+    parser.add_argument(
+        "--type", help="station type ([1-4]", type=int, default=1)
+    parser.add_argument(
+        "--acis-url", help="ACIS MultiStnData endpoint (e.g. a local fake_acis.py server)",
+        default=dh.ACIS_MULTI_URL)
+    parser.add_argument(
+        "--cube", help="climate cube file (see cube.py) to read the month from, the days it "
+                       "lacks are fetched and appended first; a new file is started at the month")
+    parser.add_argument(
+        "--profile", help="write a json report of stage timings to this file")
+    return parser.parse_args()
+
+
+## daily data and normals of the stations for one month (YYYY-MM)
+def fetch_month(sids, month, url=dh.ACIS_MULTI_URL):
+    year, month, last_day, month_name = dh.cal_month(month)
+    return dh.read_multi(
+        url, sids, '{}-{}-01'.format(year, month), '{}-{}-{}'.format(year, month, last_day), ELEMS)
+
+
+## masked float array (stations, days, len(ELEMS)) of a MultiStnData response
+def to_array(response, sids, days):
+    return dh.acis_array(dh.multi_values(response, sids, days, len(ELEMS)), TRACE)
+
+
+## monthly mean, extremes (day of month, the last one on ties like month_high_low),
+## precipitation and normals of every station, as masked arrays by station
+def summarize(data):
+    maxt, mint, pcpn, avgt_norm, pcpn_norm = [data[..., k] for k in range(len(ELEMS))]
+    days = data.shape[1]
+    high = maxt.max(axis=1)
+    low = mint.min(axis=1)
+    return {
+        'mean_temp': ((maxt + mint) / 2.).mean(axis=1),
+        'mean_norm': avgt_norm.mean(axis=1),
+        'highist': high,
+        'high_date': np.ma.masked_array(
+            days - maxt[:, ::-1].argmax(axis=1), np.ma.getmaskarray(high)),
+        'lowest': low,
+        'low_date': np.ma.masked_array(
+            days - mint[:, ::-1].argmin(axis=1), np.ma.getmaskarray(low)),
+        'precip': pcpn.sum(axis=1),
+        'precip_norm': pcpn_norm.sum(axis=1),
+    }
+
+
+## summary of one month (YYYY-MM) for stations [(name, ACIS id)], read from the cube
+## file at cube_path (fetching and appending the days it lacks first) or from ACIS
+def month_summary(month, stations, url=dh.ACIS_MULTI_URL, cube_path=None):
+    names = [name for (name, sid) in stations]
+    sids = [sid for (name, sid) in stations]
+    if not cube_path:
+        with instrument.span('acis_fetch'):
+            response = fetch_month(sids, month, url)
+        with instrument.span('summarize'):
+            return summarize(to_array(response, sids, int(dh.cal_month(month)[2])))
+
+    year, month, last_day, month_name = dh.cal_month(month)
+    first = '{}-{}-01'.format(year, month)
+    last = '{}-{}-{}'.format(year, month, last_day)
+    if not os.path.exists(cube_path):
+        cube.create_cube(cube_path, stations, first)
+    data = cube.Cube(cube_path)
+    if data.index(first) < 0 or not set(names) <= set(data.stations):
+        raise ValueError('{} does not hold {}-{} for all stations'.format(cube_path, year, month))
+    if data.index(last) >= data.days:
+        with instrument.span('acis_fetch'):
+            cube.update(data, last, url, trace=TRACE)
+    with instrument.span('summarize'):
+        return summarize(data.masked(data.month(int(year), int(month)), NAMES, names))
+
+
+## build_info tables of all stations in one pass
+def render(summary):
+    return dh.build_infos(
+        summary['mean_temp'], summary['mean_norm'], summary['highist'], summary['high_date'],
+        summary['lowest'], summary['low_date'], summary['precip'], summary['precip_norm'])
+
+
+## html page with a heading and table per station
+def write_page(path, title, names, infos):
+    with open(path, 'w') as handle:
+        handle.write('<html>\n<head><meta charset="utf-8"><title>{0}</title></head>\n<body>\n<h1>{0}</h1>\n'.format(
+            html.escape(title)))
+        for name, info in zip(names, infos):
+            handle.write('<h2>{}</h2>\n{}'.format(html.escape(name), info))
+        handle.write('</body>\n</html>\n')
+
+
+if __name__ == '__main__':
+    """Main script"""
+    logging.basicConfig(level=logging.DEBUG)
+    args = parse_arguments()
+
+    output_dir = args.dir
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    year, month, last_day, month_name = dh.cal_month(args.month)
+    selected = ws.registry.select(args.type)
+    sids = [sid for (name, sid) in selected]
+    logging.info("Getting {} {} data for {} stations".format(month_name, year, len(sids)))
+    names = [name for (name, sid) in selected]
+    summary = month_summary(args.month, selected, args.acis_url, args.cube)
+    with instrument.span('render'):
+        infos = render(summary)
+    path = os.path.join(output_dir, OUTPUTFN.format(args.month))
+    write_page(path, '{} {}'.format(month_name, year), names, infos)
+    logging.info("Wrote {}".format(path))
+
+    if args.profile:
+        instrument.write_report(args.profile, stations=len(sids), month=args.month)
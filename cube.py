@@ -0,0 +1,194 @@
+#! /usr/bin/env python3
+# Appendable file of daily ACIS values of many stations (a station x day x variable cube)
+#
+# layout: the header of tables.py (MAGIC, length, json header padded to
+# tables.ALIGN bytes), then one record per day: float64 values and
+# uint8 flags (data_helpers.FLAG_*), each of shape (stations, variables). The
+# header lists the stations (names and ACIS ids), variables (with the ACIS
+# elements they come from) and first date; the number of days follows from
+# the file size, so new days are appended without touching the stored ones.
+# Cube memory maps the file and gives the values as a (stations, days,
+# variables) view, so month, season and year slices are views as well.
+#
+#   python cube.py climate.cube 2019-12-31 --start 2019-01-01 --type 4
+
+import argparse
+import logging
+import os
+import numpy as np
+import pandas as pd
+# load ACRC modules
+import data_helpers as dh
+import stations as ws
+import tables
+
+MAGIC = b'CLIMCUBE1\n'
+# variables: (name, ACIS element)
+VARIABLES = [
+    ('maxt', {'name': 'maxt'}),
+    ('mint', {'name': 'mint'}),
+    ('avgt', {'name': 'avgt'}),
+    ('pcpn', {'name': 'pcpn'}),
+    ('avgt_normal', {'name': 'avgt', 'normal': '1'}),
+    ('pcpn_normal', {'name': 'pcpn', 'normal': '1'}),
+]
+# days before the last stored day fetched again on update, ACIS revises recent values
+REFETCH_DAYS = 7
+# seasons by their months, december counts to the next year's winter
+SEASONS = {'DJF': (12, 1, 2), 'MAM': (3, 4, 5), 'JJA': (6, 7, 8), 'SON': (9, 10, 11)}
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='create or extend a daily climate cube file')
+    parser.add_argument(
+        "path", help="cube file")
+    parser.add_argument(
+        "end", help="last date (YYYY-MM-DD)")
+    parser.add_argument(
+        "--start", help="first date of a new cube (YYYY-MM-DD)")
+    parser.add_argument(
+        "--type", help="station type of a new cube ([1-4]", type=int, default=1)
+    parser.add_argument(
+        "--acis-url", help="ACIS MultiStnData endpoint (e.g. a local fake_acis.py server)",
+        default=dh.ACIS_MULTI_URL)
+    return parser.parse_args()
+
+
+def _record(stations, variables):
+    shape = (stations, variables)
+    return np.dtype([('values', '<f8', shape), ('flags', 'u1', shape)])
+
+
+## create an empty cube file (no days yet) for stations [(name, ACIS id)]
+def create_cube(path, stations, start, variables=VARIABLES):
+    header = {
+        'stations': [name for (name, sid) in stations],
+        'sids': [sid for (name, sid) in stations],
+        'variables': [name for (name, elem) in variables],
+        'elems': [elem for (name, elem) in variables],
+        'start': str(pd.Timestamp(start).date()),
+    }
+    with open(path, 'wb') as handle:
+        handle.write(tables.header_bytes(header, MAGIC))
+    return Cube(path)
+
+
+class Cube:
+    """Memory mapped cube file: values and flags as (stations, days, variables) views"""
+    def __init__(self, path):
+        self.path = path
+        self.header, self.offset = tables.read_header(path, MAGIC, 'climate cube')
+        self.stations = self.header['stations']
+        self.variables = self.header['variables']
+        self.start = np.datetime64(self.header['start'], 'D')
+        self.record = _record(len(self.stations), len(self.variables))
+        self._map()
+
+    def _map(self):
+        days = (os.path.getsize(self.path) - self.offset) // self.record.itemsize
+        if days:
+            records = np.memmap(self.path, dtype=self.record, mode='r', offset=self.offset, shape=(days,))
+        else:
+            records = np.zeros(0, dtype=self.record)
+        self.days = days
+        self.values = records['values'].transpose(1, 0, 2)
+        self.flags = records['flags'].transpose(1, 0, 2)
+
+    @property
+    def dates(self):
+        """datetime64[D] of every day in the file"""
+        return self.start + np.arange(self.days)
+
+    @property
+    def end(self):
+        """day after the last day in the file"""
+        return self.start + self.days
+
+    def index(self, date):
+        """day number of a date"""
+        return int((np.datetime64(pd.Timestamp(date).date(), 'D') - self.start).astype(int))
+
+    def between(self, first, last):
+        """slice of the days from first to last (included), limited to the days in the file"""
+        return slice(max(self.index(first), 0), min(self.index(last) + 1, self.days))
+
+    def month(self, year, month):
+        first = pd.Timestamp(year=year, month=month, day=1)
+        return self.between(first, first + pd.offsets.MonthEnd(0))
+
+    def season(self, year, season):
+        """slice of a season (SEASONS), DJF of year starts in december of year - 1"""
+        months = SEASONS[season]
+        first = pd.Timestamp(year=year - (months[0] > months[-1]), month=months[0], day=1)
+        last = pd.Timestamp(year=year, month=months[-1], day=1) + pd.offsets.MonthEnd(0)
+        return self.between(first, last)
+
+    def year(self, year):
+        return self.between('{}-01-01'.format(year), '{}-12-31'.format(year))
+
+    def masked(self, days=slice(None), variables=None, stations=None):
+        """masked float array (stations, days, variables) of a slice of days, missing
+        and accumulated-later values masked; variables and stations select by name"""
+        values, flags = self.values[:, days], self.flags[:, days]
+        if variables is not None:
+            columns = [self.variables.index(name) for name in variables]
+            values, flags = values[..., columns], flags[..., columns]
+        if stations is not None:
+            rows = [self.stations.index(name) for name in stations]
+            values, flags = values[rows], flags[rows]
+        return dh.flags_masked(values, flags)
+
+    def write(self, start, values, flags):
+        """Store (stations, days, variables) values and flags from start on: days already
+        in the file are overwritten in place, the others appended (missing days fill a gap)"""
+        first = self.index(start)
+        if first < 0:
+            raise ValueError('{} is before the first day of {}'.format(start, self.path))
+        count = values.shape[1]
+        overlap = max(min(self.days - first, count), 0)
+        if overlap:
+            records = np.memmap(self.path, dtype=self.record, mode='r+', offset=self.offset, shape=(self.days,))
+            records['values'][first:first + overlap] = values[:, :overlap].transpose(1, 0, 2)
+            records['flags'][first:first + overlap] = flags[:, :overlap].transpose(1, 0, 2)
+            records.flush()
+            del records
+        gap = max(first - self.days, 0)
+        records = np.zeros(gap + count - overlap, dtype=self.record)
+        records['values'][:gap] = np.nan
+        records['flags'][:gap] = dh.FLAG_MISSING
+        records['values'][gap:] = values[:, overlap:].transpose(1, 0, 2)
+        records['flags'][gap:] = flags[:, overlap:].transpose(1, 0, 2)
+        with open(self.path, 'ab') as handle:
+            handle.write(records.tobytes())
+        self._map()
+
+
+## fetch the days from REFETCH_DAYS before the end of the cube (or its start) through
+## end from ACIS and write them to the cube, returns the number of days fetched
+def update(cube, end, url=dh.ACIS_MULTI_URL, refetch_days=REFETCH_DAYS, trace=0.0):
+    first = max(cube.end - refetch_days, cube.start)
+    last = np.datetime64(pd.Timestamp(end).date(), 'D')
+    if last < first:
+        return 0
+    days = int((last - first).astype(int)) + 1
+    sids = cube.header['sids']
+    response = dh.read_multi(url, sids, str(first), str(last), cube.header['elems'])
+    values, flags = dh.acis_parse(
+        dh.multi_values(response, sids, days, len(cube.variables)), trace)
+    cube.write(first, values, flags)
+    return days
+
+
+if __name__ == '__main__':
+    """Create or extend a cube file"""
+    logging.basicConfig(level=logging.DEBUG)
+    args = parse_arguments()
+    if not os.path.exists(args.path):
+        if not args.start:
+            raise SystemExit('--start is needed to create {}'.format(args.path))
+        create_cube(args.path, ws.registry.select(args.type), args.start)
+    cube = Cube(args.path)
+    days = update(cube, args.end, args.acis_url)
+    logging.info("Fetched {} days, {} holds {} stations from {} to {}".format(
+        days, args.path, len(cube.stations), cube.start, cube.end - 1))
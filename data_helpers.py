@@ -1,33 +1,102 @@
-import requests
-import urllib.request
+import os
 import re
 import calendar
 import datetime
 import dateutil.parser as parser
 import textwrap
-import matplotlib.colors as colors
 import numpy as np
 from collections import deque
 
-
-
-# read data from REST endpoint
-def read_data( url, params, header="" ):
-  resq = requests.get(url, headers=header, params=params)
+# ACIS client settings: (connect, read) timeout in seconds, retries with
+# exponential backoff on connection errors and these http statuses, pooled
+# connections per host and station ids sent per request
+ACIS_TIMEOUT = (10, 120)
+ACIS_RETRIES = 5
+ACIS_BACKOFF = 0.5
+ACIS_RETRY_STATUS = (429, 500, 502, 503, 504)
+ACIS_POOLSIZE = 8
+ACIS_BATCH = 100
+ACIS_MULTI_URL = "https://data.rcc-acis.org/MultiStnData"
+
+_session = None
+_session_pid = None
+
+# keep-alive session shared by all requests of this process, requests is
+# only imported by the first call
+def session():
+  global _session, _session_pid
+  if _session is None or _session_pid != os.getpid():
+    import requests
+    import requests.adapters
+    import urllib3.util.retry
+    retry = urllib3.util.retry.Retry(
+      total=ACIS_RETRIES, backoff_factor=ACIS_BACKOFF,
+      status_forcelist=ACIS_RETRY_STATUS, allowed_methods=None,
+      raise_on_status=False)
+    adapter = requests.adapters.HTTPAdapter(
+      pool_connections=ACIS_POOLSIZE, pool_maxsize=ACIS_POOLSIZE, max_retries=retry)
+    _session = requests.Session()
+    _session.mount('http://', adapter)
+    _session.mount('https://', adapter)
+    _session.headers['Accept-Encoding'] = 'gzip'
+    _session_pid = os.getpid()
+  return _session
+
+# read data from REST endpoint, post sends params as a json body
+# (needed for ACIS element lists like [{"name": "avgt", "normal": "1"}])
+def read_data( url, params, header="", post=False ):
+  if post:
+    resq = session().post(url, headers=header or None, json=params, timeout=ACIS_TIMEOUT)
+  else:
+    resq = session().get(url, headers=header or None, params=params, timeout=ACIS_TIMEOUT)
   # print( resq.url )
+  resq.raise_for_status()
   return resq.json()
 
+# read data from REST endpoint, sending the ids in params[key] batch at a time
+# list values of the responses (e.g. 'meta' or 'data') are concatenated
+def read_batched( url, params, key='sids', batch=ACIS_BATCH, header="", post=False ):
+  ids = params[key].split(',') if isinstance(params[key], str) else list(params[key])
+  result = {}
+  for first in range(0, len(ids), batch):
+    part = dict(params)
+    part[key] = ','.join(ids[first:first + batch])
+    for name, value in read_data(url, part, header, post).items():
+      if isinstance(value, list):
+        result.setdefault(name, []).extend(value)
+      else:
+        result[name] = value
+  return result
+
+# daily values of many stations from sdate to edate (YYYY-MM-DD) from ACIS MultiStnData
+def read_multi( url, sids, sdate, edate, elems ):
+  params = {
+    'sids': ','.join(dict.fromkeys(sids)),
+    'sdate': sdate,
+    'edate': edate,
+    'elems': elems,
+    'meta': 'sids,name'}
+  return read_batched(url, params, post=True)
+
+# ACIS value strings (stations, days, elements) of a MultiStnData response in the
+# order of sids, "M" for stations missing from the response
+def multi_values( response, sids, days, elems ):
+  index = {}
+  for n, sid in enumerate(sids):
+    index.setdefault(sid, []).append(n)
+  values = np.full((len(sids), days, elems), "M", dtype=object)
+  for station in response.get('data', []):
+    ids = [item.split()[0] for item in station['meta'].get('sids', [])]
+    rows = [n for sid in dict.fromkeys(ids) for n in index.get(sid, [])]
+    if rows and station['data']:
+      values[rows, :len(station['data'])] = np.array(station['data'], dtype=object)
+  return values.astype(str)
+
 # read file from url endpoint
 def read_file( url, params ):
-  comurl = url
-  for key, param in params.items():
-    comurl = comurl + key + "=" + param + "&"
-  # print( comurl )
-  response = urllib.request.urlopen(comurl)
-  data = response.read()      # a `bytes` object
-  text = data.decode('utf-8') # a `str`; this step can't be used if data is binary
-
-  return text
+  resq = session().get(url, params=params, timeout=ACIS_TIMEOUT)
+  resq.raise_for_status()
+  return resq.content.decode('utf-8')
 
 # calculate month start and end
 def cal_month(date = ""):
@@ -79,6 +148,33 @@ def month_high_low(data):
 
   return(month_data)
 
+# monthly weather information table, see build_info and build_infos
+INFO_TABLE = textwrap.dedent("""\
+  <table>
+    <tr>
+      <td>
+        Mean monthly temperature was {0}°F, which was {1}
+     </td>
+    </tr>
+    <tr>
+      <td>
+        The observed maximum temperature was {2}°F on the {3}{4} of the month,<br/>
+        the minimum temperature was {5}°F on the {6}{7} of the month.
+      </td>
+    </tr>
+    <tr>
+      <td>
+        The total monthly precipitation was {8}", which was {9}
+      </td>
+    </tr>
+    <tr>
+      <td>
+        Note: Normal values refer to the period 1981 to 2010.
+      </td>
+    </tr>
+  </table>
+  """)
+
   # Build monthly weather information about a city
 def build_info(mean_temp, mean_norm, highist, high_date, lowest, low_date, precip, precip_norm):
   if mean_temp == "M": mean_temp = np.nan
@@ -125,35 +221,58 @@ def build_info(mean_temp, mean_norm, highist, high_date, lowest, low_date, preci
   else:
     low_post = "th"
 
-  text = textwrap.dedent("""\
-  <table>
-    <tr>
-      <td>
-        Mean monthly temperature was {0}°F, which was {1}
-     </td>
-    </tr>
-    <tr>
-      <td>
-        The observed maximum temperature was {2}°F on the {3}{4} of the month,<br/>
-        the minimum temperature was {5}°F on the {6}{7} of the month.
-      </td>
-    </tr>
-    <tr>
-      <td>
-        The total monthly precipitation was {8}", which was {9}
-      </td>
-    </tr>
-    <tr>
-      <td>
-        Note: Normal values refer to the period 1981 to 2010.
-      </td>
-    </tr>
-  </table>
-  """)
   
   # if precip == 0.0: return ""
   #  return text.format(mean_temp[:-1], diff_text, highist, high_date, high_post, lowest, low_date, low_post, precip[:-1], precip_text)
-  return text.format(mean_temp, diff_text, highist, high_date, high_post, lowest, low_date, low_post, str(np.round(float(precip), decimals = 1)), precip_text)
+  return INFO_TABLE.format(mean_temp, diff_text, highist, high_date, high_post, lowest, low_date, low_post, str(np.round(float(precip), decimals = 1)), precip_text)
+
+# build_info for many station-months at once, one table per element of the arrays
+# (masked or nan where missing); present values give the same text as build_info,
+# except for the 11th to 13th
+def build_infos(mean_temp, mean_norm, highist, high_date, lowest, low_date, precip, precip_norm):
+  mean_temp, mean_norm, highist, lowest, precip, precip_norm = [
+    np.ma.filled(np.ma.asarray(item, dtype=float), np.nan)
+    for item in (mean_temp, mean_norm, highist, lowest, precip, precip_norm)]
+  precip = np.where(np.isnan(precip), 0., precip)
+
+  temp_diff = mean_temp - mean_norm
+  diff_text = np.where(
+    np.isnan(temp_diff), "not available.",
+    np.where(temp_diff > 0.0, np.char.add(np.char.mod("%.1f", temp_diff), "°F above normal."),
+    np.where(temp_diff == 0.0, "the same as the normal.",
+      np.char.add(np.char.mod("%.1f", np.abs(temp_diff)), "°F below normal."))))
+
+  precip_diff = precip - precip_norm
+  precip_text = np.where(
+    np.isnan(precip_diff), "not available.",
+    np.where(precip_diff > 0.0, np.char.add(np.char.mod("%.1f", precip_diff), "\" above normal."),
+    np.where(precip_diff == 0.0, "the same as the normal.",
+      np.char.add(np.char.mod("%.1f", np.abs(precip_diff)), "\" below normal."))))
+
+  columns = [
+    number_text(mean_temp, "%.1f"), diff_text,
+    number_text(highist, "%g"), date_text(high_date), ordinal_suffix(high_date),
+    number_text(lowest, "%g"), date_text(low_date), ordinal_suffix(low_date),
+    np.round(precip, decimals = 1).astype(str), precip_text]
+  return [INFO_TABLE.format(*row) for row in zip(*[column.tolist() for column in columns])]
+
+# format numbers with fmt, M where missing
+def number_text(values, fmt):
+  values = np.asarray(values, dtype=float)
+  return np.where(np.isnan(values), "M", np.char.mod(fmt, values))
+
+# days of the month as text, empty where missing
+def date_text(days):
+  days = np.ma.filled(np.ma.asarray(days, dtype=float), np.nan)
+  return np.where(np.isnan(days), "", np.char.mod("%d", np.nan_to_num(days)))
+
+# st, nd, rd or th for days of the month (11th to 13th too), empty where missing
+def ordinal_suffix(days):
+  days = np.ma.filled(np.ma.asarray(days, dtype=float), np.nan)
+  number = np.abs(np.nan_to_num(days)).astype(int)
+  last = np.where(number % 100 // 10 == 1, 0, number % 10)
+  suffix = np.select([last == 1, last == 2, last == 3], ["st", "nd", "rd"], "th")
+  return np.where(np.isnan(days), "", suffix)
 
 # rotate values in a list
 def rotate(lst, x):
@@ -177,33 +296,54 @@ def proc_acis(data, type):
 
   return new_list
 
-# set the colormap and center the colorbar
-class MidpointNormalize(colors.Normalize):
-  """
-  Normalise the colorbar so that diverging bars work there way either side from a prescribed midpoint value)
-
-  e.g. im=ax1.imshow(array, norm=MidpointNormalize(midpoint=0.,vmin=-100, vmax=100))
-  """
-  def __init__(self, vmin=None, vmax=None, midpoint=None, clip=False):
-    self.midpoint = midpoint
-    colors.Normalize.__init__(self, vmin, vmax, clip)
-
-  def __call__(self, value, clip=None):
-    # I'm ignoring masked values and all kinds of edge cases to make a
-    # simple example...
-    x, y = [self.vmin, self.midpoint, self.vmax], [0, 0.5, 1]
-    return np.ma.masked_array(np.interp(value, x, y), np.isnan(value))
-
+# flags of ACIS values, see acis_parse
+FLAG_MISSING = 1
+FLAG_TRACE = 2
+# total of this and the preceding FLAG_SUBSEQUENT days
+FLAG_ACCUMULATED = 4
+# included in a later FLAG_ACCUMULATED total
+FLAG_SUBSEQUENT = 8
+
+# proc_acis for whole arrays of ACIS values (e.g. stations x days): returns float
+# values (nan where missing, trace for "T") and uint8 flags of the same shape
+def acis_parse(data, trace=0.0):
+  text = np.char.strip(np.asarray(data, dtype=str))
+  number = np.char.rstrip(text, "AS")
+  flags = np.zeros(text.shape, dtype=np.uint8)
+  flags[(text == "M") | (number == "")] |= FLAG_MISSING
+  flags[text == "T"] |= FLAG_TRACE
+  flags[np.char.endswith(text, "A")] |= FLAG_ACCUMULATED
+  flags[np.char.endswith(text, "S")] |= FLAG_SUBSEQUENT
+  values = np.where((flags & (FLAG_MISSING | FLAG_TRACE)) > 0, "nan", number).astype(float)
+  values[text == "T"] = trace
+  return values, flags
+
+# acis_parse as a masked array: missing values and values flagged "S" (accumulated
+# into a later day) are masked
+def acis_array(data, trace=0.0):
+  values, flags = acis_parse(data, trace)
+  return flags_masked(values, flags)
+
+# masked array of values with acis_parse flags
+def flags_masked(values, flags):
+  return np.ma.masked_array(values, (flags & (FLAG_MISSING | FLAG_SUBSEQUENT)) > 0)
+
+# convert an array to the strings str() gives for each element, nan as null
+def str_values(data):
+  data = np.asarray(data)
+  text = data.astype(str)
+  if data.dtype.kind == 'f':
+    text = np.where(np.isnan(data), 'null', text)
+  return text.tolist()
+
+# comma separated values for highcharts
 def makeString(data):
-
-  # maxN_list = []
-  data= data.tolist()
-  # data = dh.makeString(tmpN_list) 
-
-  convert = ""
-  for item in data:
-    if np.isnan(item) : item = 'null'
-    convert += str(item) + ',' 
-  return convert[:-1]
-
- 
+  return ','.join(str_values(data))
+
+# MidpointNormalize moved to plot_helpers, so that importing this module doesn't
+# import matplotlib
+def __getattr__(name):
+  if name == 'MidpointNormalize':
+    import plot_helpers
+    return plot_helpers.MidpointNormalize
+  raise AttributeError("module {!r} has no attribute {!r}".format(__name__, name))
@@ -0,0 +1,197 @@
+#! /usr/bin/env python3
+# Local stand-in for the ACIS web services (StnMeta, StnData and MultiStnData)
+#
+# Answers the queries made by NightAndDay.py and data_helpers.py without
+# network access: station coordinates are made up from the station id
+# (stable, inside Alaska) unless given in a json file of {sid: [lon, lat]},
+# daily data are generated for the requested dates and elements.
+# Responses are gzipped when the client asks for it, and --fail-every makes
+# every n-th request answer 503 to exercise the client retries.
+#
+#   python fake_acis.py --port 8642
+#   python NightAndDay.py 4 outdir --acis-url http://127.0.0.1:8642/StnMeta
+
+import argparse
+import datetime
+import gzip
+import hashlib
+import http.server
+import itertools
+import json
+import logging
+import threading
+import urllib.parse
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='serve fake ACIS StnMeta/StnData responses')
+    parser.add_argument("--host", default='127.0.0.1')
+    parser.add_argument("--port", type=int, default=8642)
+    parser.add_argument(
+        "--coords", help="json file of {sid: [lon, lat]} to serve instead of made up coordinates")
+    parser.add_argument(
+        "--fail-every", help="answer every n-th request with 503", type=int, default=0)
+    parser.add_argument(
+        "--delay", help="seconds to wait before answering", type=float, default=0.)
+    return parser.parse_args()
+
+
+## made up but stable coordinates for a station id
+def station_ll(sid):
+    digest = hashlib.sha256(sid.encode()).digest()
+    lon = -165. + 35. * digest[0] / 255.
+    lat = 55. + 16. * digest[1] / 255.
+    return [round(lon, 4), round(lat, 4)]
+
+
+## made up daily values for a station, element and date
+def daily_value(sid, elem, date):
+    digest = hashlib.sha256('{} {} {}'.format(sid, elem, date).encode()).digest()
+    if digest[0] < 5:
+        return 'M'
+    if elem == 'pcpn':
+        return 'T' if digest[1] < 40 else '{:.2f}'.format(digest[2] / 255.)
+    base = 40. - 30. * abs(date.month - 7) / 6.
+    return str(int(base + digest[2] % 30 - 15))
+
+
+## made up daily normal of an element for a date (avgt or pcpn)
+def normal_value(elem, date):
+    if elem == 'pcpn':
+        return '{:.2f}'.format(0.02 + 0.04 * (1. - abs(date.month - 8) / 7.))
+    return '{:.1f}'.format(40. - 30. * abs(date.month - 7) / 6.)
+
+
+def _params(handler):
+    url = urllib.parse.urlsplit(handler.path)
+    params = {key: value[-1] for (key, value) in urllib.parse.parse_qs(url.query).items()}
+    length = int(handler.headers.get('Content-Length') or 0)
+    if length:
+        body = handler.rfile.read(length).decode()
+        try:
+            params.update(json.loads(body))
+        except ValueError:
+            params.update({key: value[-1] for (key, value) in urllib.parse.parse_qs(body).items()})
+    return url.path.rstrip('/').rsplit('/', 1)[-1], params
+
+
+def stn_meta(params, coords):
+    meta = []
+    for sid in params.get('sids', '').split(','):
+        if sid:
+            meta.append({'sids': ['{} 6'.format(sid)], 'll': coords.get(sid, station_ll(sid))})
+    return {'meta': meta}
+
+
+## requested elements as (name, normal) pairs
+def _elems(params):
+    elems = params.get('elems', 'maxt,mint,pcpn')
+    if isinstance(elems, str):
+        elems = elems.split(',')
+    return [
+        (item['name'], bool(item.get('normal'))) if isinstance(item, dict) else (item, False)
+        for item in elems]
+
+
+def _rows(sid, params):
+    elems = _elems(params)
+    start = datetime.date.fromisoformat(params['sdate'])
+    end = datetime.date.fromisoformat(params['edate'])
+    for n in range((end - start).days + 1):
+        date = start + datetime.timedelta(days=n)
+        yield date, [
+            normal_value(elem, date) if normal else daily_value(sid, elem, date)
+            for (elem, normal) in elems]
+
+
+def stn_data(params, coords):
+    sid = params.get('sid', '')
+    data = [[date.isoformat()] + values for (date, values) in _rows(sid, params)]
+    meta = {'sids': ['{} 6'.format(sid)], 'll': coords.get(sid, station_ll(sid))}
+    return {'meta': meta, 'data': data}
+
+
+def multi_stn_data(params, coords):
+    data = []
+    for sid in params.get('sids', '').split(','):
+        if sid:
+            meta = {'sids': ['{} 6'.format(sid)], 'll': coords.get(sid, station_ll(sid))}
+            data.append({'meta': meta, 'data': [values for (date, values) in _rows(sid, params)]})
+    return {'data': data}
+
+
+SERVICES = {'StnMeta': stn_meta, 'StnData': stn_data, 'MultiStnData': multi_stn_data}
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _answer(self):
+        server = self.server
+        if server.delay:
+            threading.Event().wait(server.delay)
+        with server.lock:
+            count = next(server.requests)
+        # read the body even for a failure, on a keep-alive connection it would
+        # be taken for the next request
+        service, params = _params(self)
+        if server.fail_every and count % server.fail_every == 0:
+            self._send(503, b'{"error": "fake failure"}')
+            return
+        if service not in SERVICES:
+            self._send(404, json.dumps({'error': 'unknown service ' + service}).encode())
+            return
+        try:
+            body = json.dumps(SERVICES[service](params, server.coords)).encode()
+        except (KeyError, ValueError) as error:
+            self._send(400, json.dumps({'error': str(error)}).encode())
+            return
+        self._send(200, body)
+
+    def _send(self, status, body):
+        gzipped = 'gzip' in self.headers.get('Accept-Encoding', '')
+        if gzipped:
+            body = gzip.compress(body)
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if gzipped:
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = _answer
+    do_POST = _answer
+
+    def log_message(self, format, *args):
+        logging.debug('fake acis: ' + format % args)
+
+
+## start a fake ACIS server in a background thread, returns the server (server_address, shutdown())
+def serve(host='127.0.0.1', port=0, coords=None, fail_every=0, delay=0.):
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.coords = coords or {}
+    server.fail_every = fail_every
+    server.delay = delay
+    server.lock = threading.Lock()
+    server.requests = itertools.count(1)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    """Run the fake ACIS server until interrupted"""
+    logging.basicConfig(level=logging.DEBUG)
+    args = parse_arguments()
+    coords = {}
+    if args.coords:
+        with open(args.coords) as handle:
+            coords = json.load(handle)
+    server = serve(args.host, args.port, coords, args.fail_every, args.delay)
+    logging.info("Fake ACIS at http://{}:{}/StnMeta and /StnData".format(*server.server_address))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,149 @@
+#! /usr/bin/env python3
+# Sunrise/sunset and twilight times over a regular lat/lon grid covering Alaska
+#
+# The grid is split into tiles of tile x tile points. Each tile is solved for
+# all horizons and days at once with solar.py (chunk_days at a time) and
+# written straight into a memory mapped .npy file of shape
+# (lats, lons, days, columns), so tiles can run in separate processes.
+# Values are int32 seconds from the local midnight that starts the day to the
+# event, like the station table file; circumpolar days get the same noon
+# (winter) / midnight (summer) fallback as the station pages.
+# The grid axes, columns and dates are written to a json file next to it.
+
+import argparse
+import concurrent.futures
+import logging
+import os
+import numpy as np
+import pandas as pd
+# load ACRC modules
+import NightAndDay as nd
+import solar
+import cache
+
+## configuration
+GRIDFN = 'daynight_grid.npy'
+# default extent: south of the Aleutians to north of Utqiagvik, west to the dateline
+LATMIN = 51.
+LATMAX = 72.
+LONMIN = -180.
+LONMAX = -129.
+STEP = 0.5
+# grid points per tile side
+TILE = 16
+
+COLUMNS = [column for item in nd.HORIZONS for column in item[:2]]
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description='compute rise/set and twilight times on a lat/lon grid')
+    parser.add_argument(
+        "dir", help="name of output directory")
+    parser.add_argument("--lat-min", type=float, default=LATMIN)
+    parser.add_argument("--lat-max", type=float, default=LATMAX)
+    parser.add_argument("--lon-min", type=float, default=LONMIN)
+    parser.add_argument("--lon-max", type=float, default=LONMAX)
+    parser.add_argument(
+        "--step", help="grid spacing in degrees", type=float, default=STEP)
+    parser.add_argument(
+        "--start", help="first date (YYYY-MM-DD)", default=nd.STARTDATE)
+    parser.add_argument(
+        "--end", help="last date (YYYY-MM-DD)", default=nd.ENDDATE)
+    parser.add_argument(
+        "--tile", help="grid points per tile side", type=int, default=TILE)
+    parser.add_argument(
+        "--chunk-days", help="days computed at a time for each tile", type=int,
+        default=nd.CHUNKDAYS)
+    parser.add_argument(
+        "--jobs", help="number of worker processes", type=int,
+        default=1)
+    return parser.parse_args()
+
+
+## grid axis from low to high (inclusive) in steps of step degrees
+def axis(low, high, step):
+    return np.round(np.arange(low, high + step / 2, step), 6)
+
+
+## seconds from local midnight to each event, array of shape lat.shape + (days, columns)
+def tile_seconds(lat, lon, dates):
+    dates = np.asarray(dates, dtype='datetime64[ns]')
+    start = solar.to_dublin(dates - np.timedelta64(nd.TIMEZONEOFFSET_H, 'h'))
+    rises, sets, circumpolar = solar.rise_set(
+        lat, lon, start,
+        [horizon for (rise_col, set_col, horizon, center) in nd.HORIZONS],
+        [center for (rise_col, set_col, horizon, center) in nd.HORIZONS])
+
+    #arctic night or arctic day: noon in winter, midnight in summer, decided
+    #like the station pages from the UTC start of the day
+    fallback = np.where(
+        nd.winter_days(dates - np.timedelta64(nd.TIMEZONEOFFSET_H, 'h')), 12 * 3600, 0)
+
+    events = np.stack([rises, sets], axis=-1)
+    seconds = np.where(
+        circumpolar[..., None], fallback[:, None],
+        np.round((events - start[:, None]) * 86400))
+    #(..., horizons, days, 2) -> (..., days, horizons * 2)
+    seconds = np.moveaxis(seconds, -3, -2)
+    return seconds.reshape(seconds.shape[:-2] + (-1,)).astype('<i4')
+
+
+## fill one tile of the grid file
+def compute_tile(path, rows, cols, lats, lons, start, days, chunk_days):
+    out = np.load(path, mmap_mode='r+')
+    lat, lon = np.meshgrid(lats[rows], lons[cols], indexing='ij')
+    for first in range(0, days, chunk_days):
+        last = min(days, first + chunk_days)
+        dates = np.datetime64(start, 'D') + np.arange(first, last)
+        out[rows, cols, first:last] = tile_seconds(lat, lon, dates)
+    out.flush()
+    del out
+    return lat.size
+
+
+if __name__ == '__main__':
+    """Main script"""
+
+    logging.debug("Parsing arguments")
+    args = parse_arguments()
+
+    output_dir = args.dir
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    lats = axis(args.lat_min, args.lat_max, args.step)
+    lons = axis(args.lon_min, args.lon_max, args.step)
+    start = str(pd.Timestamp(args.start).date())
+    days = len(pd.date_range(start=start, end=pd.Timestamp(args.end).normalize()))
+
+    path = os.path.join(output_dir, GRIDFN)
+    out = np.lib.format.open_memmap(
+        path, mode='w+', dtype='<i4', shape=(len(lats), len(lons), days, len(COLUMNS)))
+    del out
+    cache.save_json(path + '.json', {
+        'lats': lats.tolist(),
+        'lons': lons.tolist(),
+        'columns': COLUMNS,
+        'start': start,
+        'days': days,
+        'tz_offset_h': nd.TIMEZONEOFFSET_H,
+    })
+
+    tiles = [
+        (slice(i, i + args.tile), slice(j, j + args.tile))
+        for i in range(0, len(lats), args.tile)
+        for j in range(0, len(lons), args.tile)]
+    logging.debug("Computing {} x {} points over {} days in {} tiles".format(
+        len(lats), len(lons), days, len(tiles)))
+    items = [(path, rows, cols, lats, lons, start, days, args.chunk_days) for (rows, cols) in tiles]
+    if args.jobs > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            for n, points in enumerate(executor.map(compute_tile, *zip(*items)), 1):
+                logging.debug("tile {}/{} done ({} points)".format(n, len(tiles), points))
+    else:
+        for n, item in enumerate(items, 1):
+            points = compute_tile(*item)
+            logging.debug("tile {}/{} done ({} points)".format(n, len(tiles), points))
+    logging.debug("Grid written to {}".format(path))
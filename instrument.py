@@ -0,0 +1,115 @@
+# Timing spans and counters for NightAndDay.py runs
+#
+#   with instrument.span('render'):           # total time and number of calls
+#       ...
+#   with instrument.span('station', name):    # same, plus the time per name
+#       ...
+#   instrument.count('ephem_calls', 2)
+#   instrument.maximum('adaptive_max_error_s', 3.5)
+#
+# Everything is recorded in the Stats of the current thread, or the process
+# wide one, which threads without their own (e.g. the request threads of
+# service.py) share; Stats updates and reads hold a lock. collect() runs a
+# function with fresh Stats and returns them with its result, so work done
+# in worker processes or threads can be merged into the main Stats and end
+# up in the --profile report.
+
+import contextlib
+import copy
+import json
+import threading
+import time
+
+
+class Stats:
+    """Accumulated spans {name: {'count', 'seconds'[, 'items']}}, counters {name: n}
+    and maxima {name: largest value}"""
+    def __init__(self):
+        self.spans = {}
+        self.counters = {}
+        self.maxima = {}
+        self._lock = threading.RLock()
+
+    def add_span(self, name, seconds, item=None, count=1):
+        with self._lock:
+            entry = self.spans.setdefault(name, {'count': 0, 'seconds': 0.})
+            entry['count'] += count
+            entry['seconds'] += seconds
+            if item is not None:
+                items = entry.setdefault('items', {})
+                items[item] = items.get(item, 0.) + seconds
+
+    def add_count(self, name, n=1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+
+    def add_max(self, name, value):
+        with self._lock:
+            self.maxima[name] = max(self.maxima.get(name, value), value)
+
+    def merge(self, other):
+        with self._lock:
+            for name, entry in other['spans'].items():
+                self.add_span(name, entry['seconds'], count=entry['count'])
+                for item, seconds in entry.get('items', {}).items():
+                    items = self.spans[name].setdefault('items', {})
+                    items[item] = items.get(item, 0.) + seconds
+            for name, n in other['counters'].items():
+                self.add_count(name, n)
+            for name, value in other['maxima'].items():
+                self.add_max(name, value)
+
+    def as_dict(self):
+        """a copy, so it can be read while other threads go on recording"""
+        with self._lock:
+            return copy.deepcopy({'spans': self.spans, 'counters': self.counters, 'maxima': self.maxima})
+
+
+STATS = Stats()
+_local = threading.local()
+
+
+## the Stats work is currently recorded in
+def current():
+    return getattr(_local, 'stats', None) or STATS
+
+
+@contextlib.contextmanager
+def span(name, item=None):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        current().add_span(name, time.perf_counter() - start, item)
+
+
+def count(name, n=1):
+    current().add_count(name, int(n))
+
+
+def maximum(name, value):
+    current().add_max(name, float(value))
+
+
+## run func(*args, **kwargs) with fresh Stats, returns (result, stats as a dict)
+def collect(func, *args, **kwargs):
+    previous = getattr(_local, 'stats', None)
+    _local.stats = Stats()
+    try:
+        result = func(*args, **kwargs)
+        return result, _local.stats.as_dict()
+    finally:
+        _local.stats = previous
+
+
+## merge stats returned by collect into the process wide Stats
+def merge(stats):
+    STATS.merge(stats)
+
+
+## write the process wide Stats and extra fields as a json report
+def write_report(path, **extra):
+    report = dict(extra)
+    report.update(STATS.as_dict())
+    with open(path, 'w') as handle:
+        json.dump(report, handle, indent=1, sort_keys=True)
@@ -0,0 +1,239 @@
+#! /usr/bin/env python3
+# Station maps of the monthly climate summaries (see climate.py)
+#
+# StationMap builds the figure once: the Alaska basemap (coastlines with
+# cartopy if it is installed, a plain lon/lat frame otherwise), one marker
+# per station, value labels at the label offsets of stations.py and a
+# colorbar. Every product (a variable of one month) then only swaps the
+# marker colors, labels, norm and title before the figure is saved, so a
+# batch doesn't pay for figure construction per image. With --jobs the
+# products are spread over worker processes, each building its map once.
+#
+#   python maps.py 2019-01 outdir --end 2019-12 --type 4 --cube climate.cube --jobs 4
+
+import argparse
+import concurrent.futures
+import logging
+import os
+import numpy as np
+import pandas as pd
+import matplotlib
+matplotlib.use('Agg')
+import matplotlib.figure
+import matplotlib.ticker
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+# load ACRC modules
+import NightAndDay as nd
+import data_helpers as dh
+import plot_helpers as ph
+import stations as ws
+import climate
+import instrument
+
+try:
+    import cartopy.crs as ccrs
+except ImportError:
+    ccrs = None
+
+## configuration
+MAPFN = '{product}_{month}.png'
+# lon/lat extent of the maps and figure size (inches) and resolution
+EXTENT = (-170., -129., 51., 72.)
+FIGSIZE = (8., 6.)
+DPI = 100
+# products: name -> (title, values from a climate.summarize result, colormap,
+# midpoint of the colors or None, unit, label format)
+PRODUCTS = {
+    'temp_anomaly': (
+        'Mean temperature departure from normal', lambda s: s['mean_temp'] - s['mean_norm'],
+        'RdBu_r', 0., '°F', '%.1f'),
+    'precip_percent': (
+        'Precipitation, percent of normal', lambda s: 100. * s['precip'] / s['precip_norm'],
+        'BrBG', 100., '%', '%.0f'),
+    'mean_temp': ('Mean temperature', lambda s: s['mean_temp'], 'coolwarm', None, '°F', '%.1f'),
+    'precip': ('Total precipitation', lambda s: s['precip'], 'YlGnBu', None, 'in', '%.1f'),
+}
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='station maps of monthly climate summaries')
+    parser.add_argument(
+        "month", help="(first) month (YYYY-MM)")
+    parser.add_argument(
+        "dir", help="name of output directory")
+    parser.add_argument(
+        "--end", help="last month (YYYY-MM), default the first one")
+    parser.add_argument(
+        "--type", help="station type ([1-4]", type=int, default=1)
+    parser.add_argument(
+        "--products", help="comma separated products ({})".format(', '.join(PRODUCTS)),
+        default=','.join(PRODUCTS))
+    parser.add_argument(
+        "--cube", help="climate cube file to read the months from (see climate.py --cube)")
+    parser.add_argument(
+        "--jobs", help="number of worker processes", type=int, default=1)
+    parser.add_argument(
+        "--acis-url", help="ACIS MultiStnData endpoint", default=dh.ACIS_MULTI_URL)
+    parser.add_argument(
+        "--acis-station-url", help="ACIS StnMeta endpoint", default=nd.ACIS_STATION_URL)
+    parser.add_argument(
+        "--cache-dir", help="directory for cached station metadata", default=nd.CACHEDIR)
+    parser.add_argument(
+        "--offline", help="use cached station coordinates only", action='store_true')
+    parser.add_argument(
+        "--profile", help="write a json report of stage timings to this file")
+    return parser.parse_args()
+
+
+class StationMap:
+    """Figure with basemap, station markers, labels and colorbar, built once
+
+    draw() swaps the data layers and title and saves the figure.
+    """
+    def __init__(self, lats, lons, label_x, label_y, extent=EXTENT):
+        self.figure = matplotlib.figure.Figure(figsize=FIGSIZE, dpi=DPI)
+        FigureCanvasAgg(self.figure)
+        if ccrs is not None:
+            ax = self.figure.add_subplot(projection=ccrs.AlbersEqualArea(-154, 50, standard_parallels=(55, 65)))
+            ax.set_extent(extent, crs=ccrs.PlateCarree())
+            ax.coastlines('50m', linewidth=0.5)
+            transform = {'transform': ccrs.PlateCarree()}
+        else:
+            ax = self.figure.add_subplot()
+            ax.set_xlim(extent[:2])
+            ax.set_ylim(extent[2:])
+            ax.set_aspect(1. / np.cos(np.radians(np.mean(extent[2:]))))
+            ax.grid(linewidth=0.3)
+            ax.set_xlabel('longitude')
+            ax.set_ylabel('latitude')
+            transform = {}
+        self.points = ax.scatter(
+            lons, lats, c=np.zeros(len(lats)), s=25, edgecolors='k', linewidths=0.3, zorder=3, **transform)
+        # stations with a label offset get their value written next to them
+        self.labelled = np.flatnonzero((label_x != 0) | (label_y != 0))
+        self.labels = [
+            ax.text(lons[k] + label_x[k], lats[k] + label_y[k], '', fontsize=6, zorder=4, **transform)
+            for k in self.labelled]
+        self.colorbar = self.figure.colorbar(self.points, ax=ax, shrink=0.8)
+        self.title = ax.set_title('')
+
+    def draw(self, path, title, values, cmap, norm, unit, fmt):
+        values = np.ma.masked_invalid(np.asarray(values, dtype=float))
+        self.points.set_cmap(matplotlib.colormaps[cmap].with_extremes(bad='lightgrey'))
+        self.points.set_norm(norm)
+        self.points.set_array(values)
+        self.colorbar.update_normal(self.points)
+        self.colorbar.set_ticks(colorbar_ticks(norm))
+        self.colorbar.set_label(unit)
+        for text, k in zip(self.labels, self.labelled):
+            text.set_text('' if values.mask[k] else fmt % values[k])
+        self.title.set_text(title)
+        self.figure.savefig(path)
+
+
+## ticks of a colorbar, found separately below and above the midpoint of a
+## MidpointNormalize (the two halves have their own scale) and kept within the
+## range of each half: the norm clips, ticks outside it would be drawn at the ends
+def colorbar_ticks(norm):
+    if norm.midpoint is None:
+        parts, ticks = [(norm.vmin, norm.vmax)], []
+    else:
+        parts, ticks = [(norm.vmin, norm.midpoint), (norm.midpoint, norm.vmax)], [norm.midpoint]
+    locator = matplotlib.ticker.MaxNLocator(4, steps=[1, 2, 2.5, 5, 10])
+    for (low, high) in parts:
+        if high > low:
+            values = locator.tick_values(low, high)
+            ticks.extend(values[(values >= low) & (values <= high)])
+    return np.unique(ticks)
+
+
+# the map of this process, built by the first draw_product call
+_map = None
+
+
+def _draw(path, product, title, values, limits, layers):
+    global _map
+    if _map is None:
+        with instrument.span('map_setup'):
+            _map = StationMap(*layers)
+    name, getter, cmap, midpoint, unit, fmt = PRODUCTS[product]
+    norm = ph.MidpointNormalize(vmin=limits[0], vmax=limits[1], midpoint=midpoint)
+    with instrument.span('map_render', product):
+        _map.draw(path, title, values, cmap, norm, unit, fmt)
+    return path
+
+
+## draw one product with the map of this process, layers are the StationMap
+## arguments (lats, lons, label_x, label_y); returns (path, stats of the work)
+def draw_product(path, product, title, values, limits, layers):
+    return instrument.collect(_draw, path, product, title, values, limits, layers)
+
+
+## color limits of a product shared by all its months: the range of the finite
+## values (a zero normal makes precip_percent inf, drawn grey like missing data),
+## widened to include the midpoint if there is one (MidpointNormalize puts it at
+## the middle of the colormap however far each end is from it)
+def limits(values, midpoint):
+    values = np.asarray(values, dtype=float)
+    values = values[np.isfinite(values)]
+    if not values.size:
+        return (0., 1.) if midpoint is None else (midpoint - 1., midpoint + 1.)
+    low, high = values.min(), values.max()
+    if midpoint is not None:
+        low, high = min(low, midpoint), max(high, midpoint)
+    return low, high if high > low else low + 1.
+
+
+if __name__ == '__main__':
+    """Main script"""
+    logging.basicConfig(level=logging.DEBUG)
+    args = parse_arguments()
+
+    output_dir = args.dir
+    if not os.path.isdir(output_dir):
+        os.makedirs(output_dir)
+
+    products = args.products.split(',')
+    months = [str(month) for month in pd.period_range(args.month, args.end or args.month, freq='M')]
+    selected = ws.registry.select(args.type)
+
+    meta = nd.get_acis_stn_latlon(
+        args.acis_station_url, args.type, os.path.join(args.cache_dir, nd.METACACHEFN),
+        offline=args.offline)
+    stations = [(name, sid) for (name, sid) in selected if name in meta]
+    rows = [ws.registry.index(name) for (name, sid) in stations]
+    lats = np.array([meta[name]['lat'] for (name, sid) in stations])
+    lons = np.array([meta[name]['lon'] for (name, sid) in stations])
+    layers = (lats, lons, ws.registry.label_x[rows], ws.registry.label_y[rows])
+
+    # values of every product and month, computed here so the color scale is shared
+    values = {}
+    for month in months:
+        summary = climate.month_summary(month, stations, args.acis_url, args.cube)
+        for product in products:
+            values[product, month] = np.ma.filled(
+                np.ma.asarray(PRODUCTS[product][1](summary), dtype=float), np.nan)
+
+    jobs = []
+    for product in products:
+        title, getter, cmap, midpoint, unit, fmt = PRODUCTS[product]
+        scale = limits([values[product, month] for month in months], midpoint)
+        for month in months:
+            year, number, last_day, month_name = dh.cal_month(month)
+            jobs.append((
+                os.path.join(output_dir, MAPFN.format(product=product, month=month)), product,
+                '{}, {} {}'.format(title, month_name, year), values[product, month], scale, layers))
+    logging.info("Drawing {} maps of {} stations".format(len(jobs), len(stations)))
+
+    if args.jobs > 1:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=args.jobs) as executor:
+            results = list(executor.map(draw_product, *zip(*jobs), chunksize=max(len(jobs) // (4 * args.jobs), 1)))
+    else:
+        results = [draw_product(*job) for job in jobs]
+    for path, stats in results:
+        instrument.merge(stats)
+    logging.info("Wrote {} maps to {}".format(len(results), output_dir))
+
+    if args.profile:
+        instrument.write_report(args.profile, maps=len(results), stations=len(stations))
@@ -0,0 +1,39 @@
+# plotting helpers that need matplotlib, kept apart from data_helpers so the
+# scripts that don't draw don't import it
+import matplotlib.colors as colors
+import numpy as np
+
+# set the colormap and center the colorbar
+class MidpointNormalize(colors.Normalize):
+  """
+  Normalise the colorbar so that diverging bars work there way either side from a prescribed midpoint value)
+
+  e.g. im=ax1.imshow(array, norm=MidpointNormalize(midpoint=0.,vmin=-100, vmax=100))
+  """
+  def __init__(self, vmin=None, vmax=None, midpoint=None, clip=False):
+    self.midpoint = midpoint
+    colors.Normalize.__init__(self, vmin, vmax, clip)
+
+  # vmin -> 0, midpoint -> 0.5, vmax -> 1, linear in between and clipped outside like
+  # np.interp; masked and nan values stay masked. Works on whole (masked) arrays at once.
+  def __call__(self, value, clip=None):
+    result, is_scalar = self.process_value(value)
+    self.autoscale_None(result)
+    vmin, vmax = float(self.vmin), float(self.vmax)
+    midpoint = (vmin + vmax) / 2. if self.midpoint is None else float(self.midpoint)
+    data = np.ma.getdata(result)
+    with np.errstate(divide='ignore', invalid='ignore'):
+      scaled = np.where(
+        data < midpoint, 0.5 * (data - vmin) / (midpoint - vmin),
+        0.5 + 0.5 * (data - midpoint) / (vmax - midpoint))
+    scaled = np.clip(np.nan_to_num(scaled, nan=0.5), 0., 1.)
+    result = np.ma.masked_array(scaled, np.ma.getmaskarray(result) | np.isnan(data))
+    return result[0] if is_scalar else result
+
+  def inverse(self, value):
+    vmin, vmax = float(self.vmin), float(self.vmax)
+    midpoint = (vmin + vmax) / 2. if self.midpoint is None else float(self.midpoint)
+    value = np.asarray(value, dtype=float)
+    return np.where(
+      value < 0.5, vmin + value * 2. * (midpoint - vmin),
+      midpoint + (value - 0.5) * 2. * (vmax - midpoint))
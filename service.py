@@ -0,0 +1,276 @@
+#! /usr/bin/env python3
+# Local HTTP service answering daylight queries on demand
+#
+#   GET /daylight?station=Fairbanks&start=2019-01-01&end=2019-03-31&horizons=day,civil
+#   GET /daylight?lat=64.8&lon=-147.9&start=2019-06-01&end=2019-06-30
+#   GET /stations        names and coordinates of the known stations
+#   GET /stats           cache statistics and stage timings
+#
+# /daylight answers with the highcharts range arrays [[x, low, high], ...]
+# of the SERIES in the requested horizons (day, civil, nautical, astronomical
+# twilight, night; default all), in the shape makeRange writes them into
+# daynight.html; x counts days from the start date like the page does from --start.
+# Rise/set times are computed a calendar year at a time for all horizons and
+# kept in an in-process LRU cache (and the on-disk table cache of
+# NightAndDay.py), so after the first query for a place and year answers only
+# slice and format. Computations borrow their ephem.Observer from a pool of
+# reused observers, which also limits how many run at once.
+#
+#   python service.py --port 8650 --engine numpy
+
+import argparse
+import contextlib
+import functools
+import http.server
+import json
+import logging
+import os
+import queue
+import threading
+import urllib.parse
+import ephem
+import numpy as np
+import pandas as pd
+# load ACRC modules
+import NightAndDay as nd
+import cache
+import instrument
+
+## configuration
+PORT = 8650
+# station-years of rise/set tables kept in memory
+CACHEYEARS = 512
+# observers in the pool, i.e. computations at a time
+OBSERVERS = 4
+# longest date range answered, in days
+MAXDAYS = 3 * 366
+# coordinates are rounded to this many decimals, so nearby queries share tables
+LATLONDIGITS = 4
+# horizon names of the query, each selecting the SERIES of its band: day, the
+# twilights between a HORIZONS row and the one above it, and night below the last
+HORIZONNAMES = ['day', 'civil', 'nautical', 'astronomical', 'night']
+# years answered: whole years are computed and must fit datetime64[ns]
+FIRSTYEAR = pd.Timestamp.min.year + 1
+LASTYEAR = pd.Timestamp.max.year - 1
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(description='serve daylight data as json')
+    parser.add_argument("--host", default='127.0.0.1')
+    parser.add_argument("--port", type=int, default=PORT)
+    parser.add_argument(
+        "--engine", help="rise/set engine", choices=nd.ENGINES, default='ephem')
+    parser.add_argument(
+        "--type", help="station type of the stations known by name ([1-4]", type=int, default=4)
+    parser.add_argument(
+        "--cache-years", help="station-years of rise/set tables kept in memory", type=int,
+        default=CACHEYEARS)
+    parser.add_argument(
+        "--observers", help="computations at a time", type=int, default=OBSERVERS)
+    parser.add_argument(
+        "--cache-dir", help="directory for cached station metadata and tables",
+        default=nd.CACHEDIR)
+    parser.add_argument(
+        "--cache-size", help="size limit of the on-disk rise/set table cache in MB, 0 disables it",
+        type=float, default=nd.TABLECACHE_MB)
+    parser.add_argument(
+        "--offline", help="never contact ACIS, use cached coordinates only", action='store_true')
+    parser.add_argument(
+        "--acis-url", help="ACIS StnMeta endpoint", default=nd.ACIS_STATION_URL)
+    return parser.parse_args()
+
+
+class ObserverPool:
+    """ephem.Observer objects lent out one computation at a time and reused"""
+    def __init__(self, size):
+        self._free = queue.LifoQueue()
+        for _ in range(size):
+            self._free.put(ephem.Observer())
+
+    @contextlib.contextmanager
+    def observer(self):
+        observer = self._free.get()
+        try:
+            yield observer
+        finally:
+            self._free.put(observer)
+
+
+## band (HORIZONNAMES) of a SERIES entry: night if it reaches midnight, otherwise
+## the darkest HORIZONS row of its columns
+def series_band(low, high):
+    if {low, high} & {'zeroAM', 'zeroPM'}:
+        return HORIZONNAMES[-1]
+    rows = [k for (k, item) in enumerate(nd.HORIZONS) for column in (low, high) if column in item[:2]]
+    return HORIZONNAMES[max(rows)]
+
+
+class QueryError(Exception):
+    """A query that can't be answered, with the http status to answer with"""
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class Daylight:
+    """Computation backend: cached event matrices by place and year"""
+    def __init__(self, stations, engine='ephem', cache_years=CACHEYEARS, observers=OBSERVERS,
+                 result_cache=None):
+        self.stations = stations
+        self.engine = engine
+        self.result_cache = result_cache
+        self.pool = ObserverPool(observers)
+        self.year_events = functools.lru_cache(maxsize=cache_years)(self._year_events)
+
+    def _year_events(self, lat, lon, year):
+        """read only int64 event matrix (days, EVENTS) of one place and year"""
+        dates = pd.Series(pd.date_range('{}-01-01'.format(year), '{}-12-31'.format(year)))
+        with self.pool.observer() as observer, instrument.span('compute'):
+            times = nd.station_times(
+                lat, lon, dates, self.engine, self.result_cache, observer=observer)
+            events = nd.event_matrix(times)
+        if self.result_cache is not None:
+            self.result_cache.evict()
+        events.setflags(write=False)
+        return events
+
+    def place(self, params):
+        """(name, lat, lon) of the station or lat/lon of a query"""
+        if 'station' in params:
+            name = params['station']
+            if name not in self.stations:
+                raise QueryError('unknown station {}'.format(name), 404)
+            return name, self.stations[name]['lat'], self.stations[name]['lon']
+        try:
+            lat, lon = float(params['lat']), float(params['lon'])
+        except (KeyError, ValueError):
+            raise QueryError('give station or lat and lon')
+        if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+            raise QueryError('lat/lon out of range')
+        return None, lat, lon
+
+    def query(self, params):
+        """json text answering a /daylight query"""
+        name, lat, lon = self.place(params)
+        lat, lon = round(lat, LATLONDIGITS), round(lon, LATLONDIGITS)
+        try:
+            start = pd.Timestamp(params.get('start', nd.STARTDATE))
+            end = pd.Timestamp(params.get('end', nd.ENDDATE))
+        except (ValueError, TypeError, OverflowError) as error:
+            raise QueryError(str(error))
+        if pd.isna(start) or pd.isna(end):
+            raise QueryError('start and end must be dates')
+        if start.tz is not None or end.tz is not None:
+            raise QueryError('start and end must be dates without a time zone')
+        start, end = start.normalize(), end.normalize()
+        if not (FIRSTYEAR <= start.year and end.year <= LASTYEAR):
+            raise QueryError('dates must lie in the years {} to {}'.format(FIRSTYEAR, LASTYEAR))
+        days = (end - start).days + 1
+        if not 0 < days <= MAXDAYS:
+            raise QueryError('date range must cover 1 to {} days'.format(MAXDAYS))
+        wanted = params.get('horizons', ','.join(HORIZONNAMES)).split(',')
+        if not set(wanted) <= set(HORIZONNAMES):
+            raise QueryError('horizons are {}'.format(', '.join(HORIZONNAMES)))
+
+        # the series of the requested bands, all their columns are in the event matrix
+        series = [item for item in nd.SERIES if series_band(item[1], item[2]) in wanted]
+        if not series:
+            raise QueryError('no series for horizons {}'.format(','.join(wanted)))
+
+        parts = []
+        for year in range(start.year, end.year + 1):
+            first = max(start, pd.Timestamp(year=year, month=1, day=1))
+            last = min(end, pd.Timestamp(year=year, month=12, day=31))
+            offset = first.dayofyear - 1
+            parts.append(self.year_events(lat, lon, year)[offset:offset + (last - first).days + 1])
+        events = np.concatenate(parts)
+        x = nd.day_numbers(days)
+
+        with instrument.span('format'):
+            ranges = [
+                '{}:{}'.format(json.dumps(suffix), nd.makeRange(
+                    x, events[:, nd.EVENTS.index(low)], events[:, nd.EVENTS.index(high)]))
+                for (suffix, low, high) in series]
+        head = json.dumps({
+            'station': name, 'lat': lat, 'lon': lon, 'start': str(start.date()),
+            'end': str(end.date()), 'engine': self.engine})
+        return head[:-1] + ', "series": {' + ','.join(ranges) + '}}'
+
+    def stats(self):
+        info = self.year_events.cache_info()
+        report = {'cache': {
+            'hits': info.hits, 'misses': info.misses, 'size': info.currsize, 'maxsize': info.maxsize}}
+        report.update(instrument.STATS.as_dict())
+        return report
+
+
+class Handler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # headers and body go out in separate writes, Nagle would hold the body
+    # back until the client acknowledges the headers (~40 ms on keep-alive)
+    disable_nagle_algorithm = True
+
+    def do_GET(self):
+        url = urllib.parse.urlsplit(self.path)
+        params = {key: value[-1] for (key, value) in urllib.parse.parse_qs(url.query).items()}
+        daylight = self.server.daylight
+        try:
+            if url.path == '/daylight':
+                with instrument.span('query'):
+                    body = daylight.query(params)
+            elif url.path == '/stations':
+                body = json.dumps(daylight.stations)
+            elif url.path == '/stats':
+                body = json.dumps(daylight.stats())
+            else:
+                raise QueryError('unknown path {}'.format(url.path), 404)
+        except QueryError as error:
+            self._send(error.status, json.dumps({'error': str(error)}))
+            return
+        except Exception as error:
+            # a failed query must still be answered, or the client only sees the connection drop
+            logging.exception('service: {} failed'.format(self.path))
+            self._send(500, json.dumps({'error': '{}: {}'.format(type(error).__name__, error)}))
+            return
+        self._send(200, body)
+
+    def _send(self, status, body):
+        body = body.encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.send_header('Access-Control-Allow-Origin', '*')
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        logging.debug('service: ' + format % args)
+
+
+## start the service in a background thread, returns the server (server_address, shutdown())
+def serve(daylight, host='127.0.0.1', port=0):
+    server = http.server.ThreadingHTTPServer((host, port), Handler)
+    server.daemon_threads = True
+    server.daylight = daylight
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == '__main__':
+    """Run the service until interrupted"""
+    args = parse_arguments()
+    stations = nd.get_acis_stn_latlon(
+        args.acis_url, args.type, os.path.join(args.cache_dir, nd.METACACHEFN),
+        offline=args.offline)
+    result_cache = None
+    if args.cache_size > 0:
+        result_cache = cache.ResultCache(
+            os.path.join(args.cache_dir, nd.TABLECACHEDIR), int(args.cache_size * 2**20))
+    daylight = Daylight(stations, args.engine, args.cache_years, args.observers, result_cache)
+    server = serve(daylight, args.host, args.port)
+    logging.info("Serving {} stations at http://{}:{}/daylight".format(len(stations), *server.server_address))
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,218 @@
+#! /usr/bin/env python3
+# Vectorized sunrise/sunset computation
+# NOAA/Meeus solar position model evaluated with numpy over whole arrays of
+# dates and horizons. Events are found with the same hour angle iteration
+# ephem uses in Observer.next_rising/next_setting, so the results (including
+# which days are circumpolar) follow the ephem path in NightAndDay.rise_set
+
+import argparse
+import sys
+import numpy as np
+
+# ephem dates count days since 1899/12/31 12:00 UT (Dublin Julian day)
+DUBLIN_EPOCH = np.datetime64('1899-12-31T12:00:00', 'ns')
+DUBLIN_JD = 2415020.0
+DAY_NS = 86400 * 10**9
+# ephem date of 1970-01-01 00:00 UT
+UNIX_DUBLIN = (np.datetime64('1970-01-01', 'ns') - DUBLIN_EPOCH) / np.timedelta64(1, 'D')
+
+# same iteration settings as ephem.Observer._find_rise_or_set
+ITERATIONS = 7
+PRECISION = 1. / 86400 / 10
+TAU = 2 * np.pi
+
+# solar semidiameter and horizontal parallax at 1 AU, in radians
+SEMIDIAMETER = np.radians(959.63 / 3600)
+PARALLAX = np.radians(8.794 / 3600)
+
+# polar_days: days searched ahead of the start date, points checked in
+# that window and distance the sun must keep from the horizon (radians)
+POLARWINDOW = 2.
+POLARSAMPLES = 5
+POLARMARGIN = np.radians(0.25)
+
+
+def to_dublin(dates):
+    """Convert datetime64 values to ephem (Dublin Julian day) floats"""
+    # nanoseconds since 1970 fit int64 for every datetime64[ns], nanoseconds
+    # since the Dublin epoch overflow after 2191
+    dates = np.asarray(dates, dtype='datetime64[ns]')
+    return dates.astype('int64') / DAY_NS + UNIX_DUBLIN
+
+
+def from_dublin(days, unit='s'):
+    """Convert ephem (Dublin Julian day) floats to datetime64, rounded to unit"""
+    # counted in unit from the epoch, converted to ns only as whole dates
+    scale = np.timedelta64(1, unit) / np.timedelta64(1, 'ns')
+    ticks = np.round(np.asarray(days) * (DAY_NS / scale))
+    return (DUBLIN_EPOCH.astype('datetime64[{}]'.format(unit))
+            + ticks.astype('int64').astype('timedelta64[{}]'.format(unit))).astype('datetime64[ns]')
+
+
+def parse_angle(value):
+    """Convert an ephem style angle to radians
+
+    strings are sexagesimal degrees ('-0:34'), numbers are radians
+    """
+    if not isinstance(value, str):
+        return float(value)
+    parts = value.strip().split(':')
+    sign = -1. if parts[0].startswith('-') else 1.
+    degrees = sum(abs(float(part)) / 60**i for i, part in enumerate(parts))
+    return np.radians(sign * degrees)
+
+
+def sun_position(days):
+    """Apparent right ascension, declination, sidereal time and distance of the sun
+
+    days are ephem dates (UT). Angles are returned in radians, the distance in AU.
+    """
+    jd = np.asarray(days, dtype=float) + DUBLIN_JD
+    t = (jd - 2451545.0) / 36525.0
+
+    # geometric mean longitude, mean anomaly and eccentricity
+    l0 = np.radians((280.46646 + t * (36000.76983 + t * 0.0003032)) % 360)
+    m = np.radians(357.52911 + t * (35999.05029 - 0.0001537 * t))
+    e = 0.016708634 - t * (0.000042037 + 0.0000001267 * t)
+
+    # equation of center, true longitude and anomaly
+    c = np.radians(
+        np.sin(m) * (1.914602 - t * (0.004817 + 0.000014 * t))
+        + np.sin(2 * m) * (0.019993 - 0.000101 * t)
+        + np.sin(3 * m) * 0.000289)
+    true_long = l0 + c
+    distance = 1.000001018 * (1 - e * e) / (1 + e * np.cos(m + c))
+
+    # apparent longitude (nutation and aberration) and obliquity
+    omega = np.radians(125.04 - 1934.136 * t)
+    nutation = np.radians(-0.00478) * np.sin(omega)
+    apparent_long = true_long + nutation - np.radians(0.00569) / distance
+    eps0 = 23 + (26 + (21.448 - t * (46.815 + t * (0.00059 - t * 0.001813))) / 60) / 60
+    eps = np.radians(eps0 + 0.00256 * np.cos(omega))
+
+    ra = np.arctan2(np.cos(eps) * np.sin(apparent_long), np.cos(apparent_long))
+    dec = np.arcsin(np.sin(eps) * np.sin(apparent_long))
+
+    # apparent sidereal time at greenwich
+    gmst = np.radians(
+        (280.46061837 + 360.98564736629 * (jd - 2451545.0)
+         + t * t * (0.000387933 - t / 38710000.0)) % 360)
+    gast = gmst + nutation * np.cos(eps)
+
+    return ra, dec, gast, distance
+
+
+def sun_events(lat, lon, start, horizons, centers, rising=True):
+    """Next rising or setting of the sun after each start date, for each horizon
+
+    lat and lon are in degrees, either numbers or arrays of points of the same shape,
+    start is an array of ephem dates, horizons and centers are sequences of ephem
+    horizons and use_center flags. Returns ephem dates of shape
+    lat.shape + (len(horizons), len(start)) and a matching boolean array that
+    is True where ephem would raise CircumpolarError.
+    """
+    lat = np.radians(np.asarray(lat, dtype=float))[..., None, None]
+    lon = np.radians(np.asarray(lon, dtype=float))[..., None, None]
+    start = np.asarray(start, dtype=float)
+    horizons = np.array([parse_angle(h) for h in horizons])[:, None]
+    centers = np.asarray(centers, dtype=bool)[:, None]
+    shape = np.broadcast_shapes(lat.shape, lon.shape, (len(horizons), len(start)))
+
+    d = np.broadcast_to(start, shape).copy()
+    target = np.zeros(shape)
+    done = np.zeros(shape, dtype=bool)
+    for i in range(ITERATIONS):
+        ra, dec, gast, distance = sun_position(d)
+        # geocentric altitude at which the topocentric limb or center hits the horizon
+        alt = horizons - np.where(centers, 0., SEMIDIAMETER / distance) + PARALLAX / distance
+        arg = (np.sin(alt) - np.sin(lat) * np.sin(dec)) / (np.cos(lat) * np.cos(dec))
+        target = np.where(
+            done, target, np.where(arg < -1., np.pi + 1e-15,
+                                   np.where(arg > 1., -1e-15, np.arccos(np.clip(arg, -1., 1.)))))
+        ha = gast + lon - ra
+        difference = (-target if rising else target) - ha
+        if i == 0:
+            bump = (difference % TAU) / TAU
+            bump = np.where(np.abs(bump) < PRECISION, bump + 1, bump)
+        else:
+            bump = ((difference + np.pi) % TAU - np.pi) / TAU
+        done |= np.abs(bump) < PRECISION
+        d = np.where(done, d, d + bump)
+
+    circumpolar = (target > np.pi) | (target < 0)
+    return d, circumpolar
+
+
+def rise_set(lat, lon, start, horizons, centers):
+    """Next risings and settings after each start date, for each horizon
+
+    Returns (rises, sets, circumpolar) as arrays of shape
+    lat.shape + (len(horizons), len(start)), circumpolar is True where either
+    ephem search would fail.
+    """
+    rises, rise_polar = sun_events(lat, lon, start, horizons, centers, rising=True)
+    sets, set_polar = sun_events(lat, lon, start, horizons, centers, rising=False)
+    return rises, sets, rise_polar | set_polar
+
+
+def polar_days(lat, start, horizons, centers, window=POLARWINDOW, margin=POLARMARGIN):
+    """Days on which the sun certainly stays below or above each horizon
+
+    Checks the sun's upper and lower culmination against the horizon at
+    POLARSAMPLES points over window days from each start date (the span an
+    ephem search can cover). Only days clearing the horizon by margin radians
+    at every point are flagged, so days near a polar transition are left to
+    the solver. Returns a boolean array of shape (len(horizons), len(start)).
+    """
+    lat = np.radians(float(lat))
+    start = np.asarray(start, dtype=float)
+    offsets = np.linspace(0., window, POLARSAMPLES)[:, None]
+    ra, dec, gast, distance = sun_position(start + offsets)
+    horizons = np.array([parse_angle(h) for h in horizons])[:, None, None]
+    centers = np.asarray(centers, dtype=bool)[:, None, None]
+    alt = horizons - np.where(centers, 0., SEMIDIAMETER / distance) + PARALLAX / distance
+
+    highest = np.pi / 2 - np.abs(lat - dec)
+    lowest = np.abs(lat + dec) - np.pi / 2
+    night = (highest < alt - margin).all(axis=1)
+    day = (lowest > alt + margin).all(axis=1)
+    return night | day
+
+
+def parse_arguments():
+    """Parse command line arguments"""
+    parser = argparse.ArgumentParser(
+        description='compare the numpy engine against ephem for one location')
+    parser.add_argument("--lat", type=float, default=71.2834, help="latitude (Utqiagvik)")
+    parser.add_argument("--lon", type=float, default=-156.7815, help="longitude (Utqiagvik)")
+    parser.add_argument("--year", type=int, default=2018)
+    parser.add_argument(
+        "--tolerance", type=float, default=60.,
+        help="maximum allowed difference in seconds")
+    return parser.parse_args()
+
+
+if __name__ == '__main__':
+    """Tolerance check against the ephem path of NightAndDay.rise_set"""
+    import ephem
+    import pandas as pd
+    import NightAndDay as nd
+
+    args = parse_arguments()
+    dates = pd.Series(pd.date_range(start='{}-01-01'.format(args.year), end='{}-12-31'.format(args.year)))
+    horizons = [
+        ('day', nd.horizonDay, False), ('civil', nd.horizonCivil, True),
+        ('nautical', nd.horizonNautical, True), ('astronomical', nd.horizonAstronomical, True)]
+
+    failed = False
+    for name, horizon, center in horizons:
+        expected = nd.rise_set(horizon, center, ephem.Observer(), args.lat, args.lon, dates)
+        result = nd.rise_set(horizon, center, None, args.lat, args.lon, dates, engine='numpy')
+        for label, exp, res in zip(('rise', 'set'), expected, result):
+            diff = (res - exp).dt.total_seconds().abs()
+            worst = diff.max()
+            print('{:13s}{:5s} max diff {:7.1f} s on {}, {} days over {:.0f} s'.format(
+                name, label, worst, dates[diff.idxmax()].date(),
+                int((diff > args.tolerance).sum()), args.tolerance))
+            failed = failed or worst > args.tolerance
+    sys.exit(1 if failed else 0)
@@ -1,5 +1,7 @@
 # Alaska weather station ids 
 # --------------------------
+# (name, values) pairs, a list rather than a dict so repeated names are caught
+# by StationRegistry below instead of silently overwriting each other
 # zero position station id
 # 1 position first order stations
 # 2 position tags statewide summary cities
@@ -9,212 +11,299 @@
 # 6 position y position of label in decimal degrees
 # 7 position weather wise stations
 
-stations = {
-
-  'Anchorage' : [ 'USW00026451', 1, 1, 0, 1, 1, 0 ],
-  'Annette': [ 'USW00025308', 0, 0, 0, 1, 1, 0 ],
-  'Bethel': ['USW00026615', 1, 0, 0, 1, 1, 0 ],
-  'Bettles': ['USW00026533', 1, 0, 0, 1, 1, 0 ],
-  'Big Delta' : [ 'USW00026415', 0, 0, 0, 1, 0, 0 ],
-  'Cold Bay': [ 'USW00025624', 1, 0, 0, 1, 1, 0 ],
-  'Delta Junction': [ 'USW00026415', 1, 1, 0, 1, 1, 0 ],
-  'Fairbanks' : [ 'USW00026411', 1, 1, 0, 1, 1, 0.5 ],
-  'Gulkana': [ 'USW00026425', 1, 0, 0, 1, 1, 0 ],
-  'Homer': [ 'USW00025507', 1, 0, 0, 1, 1, 0 ],
-  'Juneau' : [ 'USW00025309', 1, 1, 0, 1, 1, 0 ],
-  'Ketchikan' : [ 'USW00025325', 1, 1, 0, 1, 0, 0 ],
-  'King Salmon' : [ 'USW00025503', 1, 1, 0, 1, 1, 0 ],
-  'Kodiak' : [ 'USW00025501', 1, 1, 0, 1, 1, -0.5 ],
-  'Kotzebue' : [ 'USW00026616', 1, 0, 0, 1, 1, 0 ],
-  'McGrath' : [ 'USW00026510', 1, 0, 0, 1, -1, 1 ],
-  'Nome' : [ 'USW00026617', 1, 1, 0, 1, 1, 0 ],
-  'St. Paul Island' : [ 'USW00025713', 1, 0, 0, 1, 1, 0 ],
-  'Talkeetna' : [ 'USW00026528', 1, 0, 0, 1, 0.8, 0.8 ],
-  'Utqiaġvik' : ['USW00027502', 1, 1, 0, 1, 1.2, 0 ],
-  'Valdez' : [ 'USW00026442', 0, 0, 1, 0, 0, 0 ],
-  'Yakutat' : [ 'USW00025339', 1, 0, 0, 1, 0, 1 ],
-  'ADAK' : [ 'USW00025704', 0, 0, 0, 1, 0, 0 ],
-  'ALYESKA' : [ 'USC00500243', 0, 0, 0, 1, 0, 0 ],
-  'AMBER LAKE' : [ 'USC00500247', 0, 0, 0, 1, 0, 0 ],
-  'ANCHORAGE FRCST OFC' : [ 'USC00500275', 0, 0, 0, 1, 0, 0 ],
-  'ANCHORAGE HILLSIDE' : [ 'USC00500279', 0, 0, 0, 1, 0, 0 ],
-  'ANCHORAGE LAKE HOOD AP' : [ 'USW00026491', 0, 0, 0, 1, 0, 0 ],
-  'ANCHORAGE RABBIT CK #2' : [ 'USC00500284', 0, 0, 0, 1, 0, 0 ],
-  'ANCHORAGE UPPER DEARMOUN' : [ 'USC00500281', 0, 0, 0, 1, 0, 0 ],
-  'ANCHORAGE WB AP' : [ 'USW00026409', 0, 0, 0, 1, 0, 0 ],
-  'ANDERSON LAKE' : [ 'USC00500302', 0, 0, 0, 1, 0, 0 ],
-  'ANNEX CREEK' : [ 'USC00500363', 0, 0, 0, 1, 0, 0 ],
-  'AUKE BAY' : [ 'USC00500464', 0, 0, 0, 1, 0, 0 ],
-  'AURORA' : [ 'USC00500490', 0, 0, 0, 1, 0, 0 ],
-  'BEAVER FALLS' : [ 'USC00500657', 0, 0, 0, 1, 0, 0 ],
-  'BENS FARM' : [ 'USC00500707', 0, 0, 0, 1, 0, 0 ],
-  'BIG RIVER LAKES' : [ 'USC00500788', 0, 0, 0, 1, 0, 0 ],
-  'BLASHKE ISLAND' : [ 'USC00500832', 0, 0, 0, 1, 0, 0 ],
-  'BUTTE 1W' : [ 'USC00501180', 0, 0, 0, 1, 0, 0 ],
-  'BUTTE 3NNE' : [ 'USC00501175', 0, 0, 0, 1, 0, 0 ],
-  'CAMPBELL CREEK SCI CTR' : [ 'USC00501220', 0, 0, 0, 1, 0, 0 ],
-  'CANNERY CREEK' : [ 'USC00501240', 0, 0, 0, 1, 0, 0 ],
-  'CANTWELL 2 E' : [ 'USC00501243', 0, 0, 0, 1, 0, 0 ],
-  'CANTWELL 4E' : [ 'USC00501244', 0, 0, 0, 1, 0, 0 ],
-  'CENTRAL #2' : [ 'USC00501466', 0, 0, 0, 1, 0, 0 ],
-  'CHANDALAR LAKE' : [ 'USC00501492', 0, 0, 0, 1, 0, 0 ],
-  'CHANDALAR SHELF DOT' : [ 'USC00501497', 0, 0, 0, 1, 0, 0 ],
-  'CHICKEN' : [ 'USC00501684', 0, 0, 0, 1, 0, 0 ],
-  'CHULITNA RIVER' : [ 'USC00501926', 0, 0, 0, 1, 0, 0 ],
-  'CIRCLE HOT SPRINGS' : [ 'USC00501987', 0, 0, 0, 1, 0, 0 ],
-  'CLEARWATER' : [ 'USC00502019', 0, 0, 0, 1, 0, 0 ],
-  'COLLEGE 5 NW' : [ 'USC00502112', 0, 0, 0, 1, 0, 0 ],
-  'COLLEGE OBSY' : [ 'USC00502107', 0, 0, 0, 1, 0, 0 ],
-  'COLVILLE VILLAGE' : [ 'USC00502126', 0, 0, 0, 1, 0, 0 ],
-  'COOPER LAKE PROJECT' : [ 'USC00502144', 0, 0, 0, 1, 0, 0 ],
-  'COOPER LANDING 5 W' : [ 'USC00502149', 0, 0, 0, 1, 0, 0 ],
-  'CORDOVA AP' : [ 'USW00026410', 0, 0, 0, 1, 0, 0 ],
-  'CORDOVA NORTH' : [ 'USC00502173', 0, 0, 0, 1, 0, 0 ],
-  'CRAIG' : [ 'USC00502227', 0, 0, 0, 1, 0, 0 ],
-  'DEADHORSE' : [ 'USW00027406', 0, 0, 0, 1, 0, 0 ],
-  'DELTA_5_NE' : [ 'USC00502350', 0, 0, 0, 1, 0, 0 ],
-  'DELTA_6N' : [ 'USC00502339', 0, 0, 0, 1, 0, 0 ],
-  'DELTA_JUNCTION_20SE' : [ 'USC00502352', 0, 0, 0, 1, 0, 0 ],
-  'DILLINGHAM FAA AP' : [ 'USC00502457', 0, 0, 0, 1, 0, 0 ],
-  'DRY CREEK' : [ 'USC00502568', 0, 0, 0, 1, 0, 0 ],
-  'DUTCH HARBOR' : [ 'USC00502587', 0, 0, 0, 1, 0, 0 ],
-  'EAGLE' : [ 'USW00026422', 0, 0, 0, 1, 0, 0 ],
-  'EAGLE RIVER 5 SE' : [ 'USC00502656', 0, 0, 0, 1, 0, 0 ],
-  'EAGLE RVR GAKONA CIR' : [ 'USC00502645', 0, 0, 0, 1, 0, 0 ],
-  'EAGLE RVR NATURE CTR' : [ 'USC00502642', 0, 0, 0, 1, 0, 0 ],
-  'EIELSON FLD' : [ 'USC00502707', 0, 0, 0, 1, 0, 0 ],
-  'EIELSON VISITOR CTR' : [ 'USC00502711', 0, 0, 0, 1, 0, 0 ],
-  'EKLUTNA WTP' : [ 'USC00502737', 0, 0, 0, 1, 0, 0 ],
-  'ELFIN COVE' : [ 'USC00502785', 0, 0, 0, 1, 0, 0 ],
-  'ELMENDORF AFB' : [ 'USW00026401', 0, 0, 0, 1, 0, 0 ],
-  'ESTER' : [ 'USC00502870', 0, 0, 0, 1, 0, 0 ],
-  'ESTER 5NE' : [ 'USC00502871', 0, 0, 0, 1, 0, 0 ],
-  'ESTER DOME' : [ 'USC00502868', 0, 0, 1, 1, 0, 0 ],
-  'FAIRBANKS 11 NE' : [ 'USW00026494', 0, 0, 0, 1, 0, 0 ],
-  'FAIRBANKS AP #2' : [ 'USC00502965', 0, 0, 0, 1, 0, 0 ],
-  'FAIRBANKS MIDTOWN' : [ 'USC00502970', 0, 0, 0, 1, 0, 0 ],
-  'FAREWELL LAKE' : [ 'USC00503009', 0, 0, 0, 1, 0, 0 ],
-  'FOX 2 SE' : [ 'USC00503181', 0, 0, 0, 1, 0, 0 ],
-  'FT KNOX MINE' : [ 'USC00503160', 0, 0, 0, 1, 0, 0 ],
-  'FT RICHARDSON WTP' : [ 'USC00503163', 0, 0, 0, 1, 0, 0 ],
-  'FUNNY RIVER' : [ 'USC00503196', 0, 0, 0, 1, 0, 0 ],
-  'FUNTER BAY' : [ 'USC00503198', 0, 0, 0, 1, 0, 0 ],
-  'GALENA' : [ 'USC00503212', 0, 0, 0, 1, 0, 0 ],
-  'GILMORE CREEK' : [ 'USC00503275', 0, 0, 0, 1, 0, 0 ],
-  'GLACIER BAY' : [ 'USC00503294', 0, 0, 0, 1, 0, 0 ],
-  'GLEN ALPS' : [ 'USC00503299', 0, 0, 0, 1, 0, 0 ],
-  'GLENNALLEN KCAM' : [ 'USC00503304', 0, 0, 0, 1, 0, 0 ],
-  'GUSTAVUS' : [ 'USW00025322', 0, 0, 0, 1, 0, 0 ],
-  'HAINES #2' : [ 'USC00503502', 0, 0, 0, 1, 0, 0 ],
-  'HAINES 40 NW' : [ 'USC00503504', 0, 0, 0, 1, 0, 0 ],
-  'HAINES AP' : [ 'USW00025323', 0, 0, 0, 1, 0, 0 ],
-  'HAYES RIVER' : [ 'USC00503573', 0, 0, 0, 1, 0, 0 ],
-  'HEALY 2 NW' : [ 'USC00503585', 0, 0, 0, 1, 0, 0 ],
-  'HIDDEN FALLS HATCHERY' : [ 'USC00503605', 0, 0, 0, 1, 0, 0 ],
-  'HOLLIS' : [ 'USC00503650', 0, 0, 0, 1, 0, 0 ],
-  'HOMER 8 NW' : [ 'USC00503672', 0, 0, 0, 1, 0, 0 ],
-  'HOMER 9 E' : [ 'USC00503682', 0, 0, 0, 1, 0, 0 ],
-  'HOONAH' : [ 'USC00503695', 0, 0, 0, 1, 0, 0 ],
-  'HOPE' : [ 'USC00503720', 0, 0, 0, 1, 0, 0 ],
-  'HYDER' : [ 'USC00503821', 0, 0, 0, 1, 0, 0 ],
-  'ILIAMNA AP' : [ 'USW00025506', 0, 0, 0, 1, 0, 0 ],
-  'INTRICATE BAY' : [ 'USC00503933', 0, 0, 0, 1, 0, 0 ],
-  'JUNEAU DWTN' : [ 'USC00504094', 0, 0, 0, 1, 0, 0 ],
-  'JUNEAU FORECAST OFFICE' : [ 'USC00504103', 0, 0, 0, 1, 0, 0 ],
-  'JUNEAU LENA PT' : [ 'USC00504107', 0, 0, 0, 1, 0, 0 ],
-  'JUNEAU MILE 17' : [ 'USC00504109', 0, 0, 0, 1, 0, 0 ],
-  'KALTAG AP' : [ 'USW00026502', 0, 0, 0, 1, 0, 0 ],
-  'KASILOF 3 NW' : [ 'USC00504425', 0, 0, 0, 1, 0, 0 ],
-  'KENAI 9N' : [ 'USC00504550', 0, 0, 0, 1, 0, 0 ],
-  'KENAI AP' : [ 'USW00026523', 0, 0, 0, 1, 0, 0 ],
-  'KENNY LAKE 7SE' : [ 'USC00504567', 0, 0, 0, 1, 0, 0 ],
-  'KETCHIKAN' : [ 'USW00025325', 0, 0, 0, 1, 0, 0 ],
-  'KEYSTONE RIDGE' : [ 'USC00504621', 0, 0, 0, 1, 0, 0 ],
-  'KITOI BAY' : [ 'USC00504812', 0, 0, 0, 1, 0, 0 ],
-  'KIVALINA AP' : [ 'USW00026642', 0, 0, 0, 1, 0, 0 ],
-  'KLAWOCK AP' : [ 'USW00025367', 0, 0, 0, 1, 0, 0 ],
-  'KOBE HILL' : [ 'USC00504971', 0, 0, 0, 1, 0, 0 ],
-  'KODIAK WWTP' : [ 'USC00504991', 0, 0, 0, 1, 0, 0 ],
-  'KOTZEBUE 25 N' : [ 'USC00505051', 0, 0, 0, 1, 0, 0 ],
-  'KUPARUK' : [ 'USC00505136', 0, 0, 0, 1, 0, 0 ],
-  'LAKE SUSITNA' : [ 'USC00505397', 0, 0, 0, 1, 0, 0 ],
-  'LAZY MTN' : [ 'USC00505464', 0, 0, 0, 1, 0, 0 ],
-  'LITTLE CHENA RVR' : [ 'USC00505516', 0, 0, 1, 0, 0, 0 ],
-  'LITTLE PORT WALTER' : [ 'USC00505519', 0, 0, 0, 1, 0, 0 ],
-  'MAIN BAY' : [ 'USC00505604', 0, 0, 0, 1, 0, 0 ],
-  'MANLEY HOT SPRINGS' : [ 'USC00505644', 0, 0, 0, 1, 0, 0 ],
-  'MATANUSKA EXPERIMENT FARM' : [ 'USC00505733', 0, 0, 0, 1, 0, 0 ],
-  'MCCARTHY 3 SW' : [ 'USC00505757', 0, 0, 0, 1, 0, 0 ],
-  'MCKINLEY PARK' : [ 'USC00505778', 0, 0, 0, 1, 0, 0 ],
-  'MILE 39 STEESE' : [ 'USC00505873', 0, 0, 0, 1, 0, 0 ],
-  'MILE 42 STEESE' : [ 'USC00505880', 0, 0, 0, 1, 0, 0 ],
-  'MINCHUMINA' : [ 'USW00026512', 0, 0, 1, 0, 0, 0 ],
-  'MIRROR LAKE SCOUT CAMP' : [ 'USC00505883', 0, 0, 0, 1, 0, 0 ],
-  'MONASHKA CREEK DAM' : [ 'USC00505884', 0, 0, 0, 1, 0, 0 ],
-  'MOOSE PASS 3 NW' : [ 'USC00505894', 0, 0, 0, 1, 0, 0 ],
-  'NABESNA' : [ 'USC00506147', 0, 0, 0, 1, 0, 0 ],
-  'NENANA MUN AP' : [ 'USW00026435', 0, 0, 0, 1, 0, 0 ],
-  'NORTH POLE' : [ 'USC00506581', 0, 0, 0, 1, 0, 0 ],
-  'NORTHWAY AP' : [ 'USW00026412', 0, 0, 0, 0, 0, 0 ],
-  'NUIQSUT AP' : [ 'USW00027515', 0, 0, 0, 1, 0, 0 ],
-  'OLD EDGERTON' : [ 'USC00506777', 0, 0, 0, 1, 0, 0 ],
-  'OUZINKIE' : [ 'USC00506853', 0, 0, 0, 1, 0, 0 ],
-  'PALMER AP' : [ 'USW00025331', 0, 0, 0, 1, 0, 0 ],
-  'PALMER JOB CORPS' : [ 'USC00506870', 0, 0, 0, 1, 0, 0 ],
-  'PAXSON' : [ 'USC00507097', 0, 0, 0, 1, 0, 0 ],
-  'PELICAN' : [ 'USC00507141', 0, 0, 0, 1, 0, 0 ],
-  'PETERSBURG 1' : [ 'USW00025329', 0, 0, 0, 1, 0, 0 ],
-  'PLANT MATERIALS CTR' : [ 'USC00507352', 0, 0, 0, 1, 0, 0 ],
-  'POINT BAKER' : [ 'USC00507421', 0, 0, 0, 1, 0, 0 ],
-  'POINT MACKENZIE' : [ 'USC00507444', 0, 0, 0, 1, 0, 0 ],
-  'PORT ALCAN' : [ 'USC00507513', 0, 0, 0, 1, 0, 0 ],
-  'PORT ALEXANDER' : [ 'USC00507557', 0, 0, 0, 1, 0, 0 ],
-  'PORT ALSWORTH' : [ 'USC00507570', 0, 0, 0, 1, 0, 0 ],
-  'PORT SAN JUAN' : [ 'USC00507738', 0, 0, 0, 1, 0, 0 ],
-  'PORTAGE GLACIER V C' : [ 'USW00026492', 0, 0, 0, 1, 0, 0 ],
-  'PORTAGE GLACIER V C' : [ 'USC00507502', 0, 0, 0, 1, 0, 0 ],
-  'PRUDHOE BAY' : [ 'USC00507780', 0, 0, 0, 1, 0, 0 ],
-  'PUNTILLA' : [ 'USC00507783', 0, 0, 0, 1, 0, 0 ],
-  'SALCHA' : [ 'USC00508140', 0, 0, 0, 1, 0, 0 ],
-  'SAND POINT' : [ 'USC00508183', 0, 0, 0, 1, 0, 0 ],
-  'SELDOVIA AP' : [ 'USW00025516', 0, 0, 0, 1, 0, 0 ],
-  'SEWARD' : [ 'USW00026438', 0, 0, 0, 1, 0, 0 ],
-  'SEWARD 19N' : [ 'USC00508377', 0, 0, 0, 1, 0, 0 ],
-  'SEWARD 8 NW' : [ 'USC00508375', 0, 0, 0, 1, 0, 0 ],
-  'SHEEP MTN LODGE' : [ 'USC00508409', 0, 0, 0, 1, 0, 0 ],
-  'SHEMYA USAF BASE' : [ 'USW00045715', 0, 0, 0, 1, 0, 0 ],
-  'SILVER LAKE' : [ 'USC00508470', 0, 0, 0, 1, 0, 0 ],
-  'SITKA JAPONSKI AP' : [ 'USW00025333', 0, 0, 0, 1, 0, 0 ],
-  'SKAGWAY' : [ 'USW00025335', 0, 0, 0, 1, 0, 0 ],
-  'SKAGWAY' : [ 'USC00508525', 0, 0, 0, 1, 0, 0 ],
-  'SKWENTNA' : [ 'USW00026514', 0, 0, 0, 1, 0, 0 ],
-  'SLANA' : [ 'USC00508547', 0, 0, 0, 1, 0, 0 ],
-  'SNETTISHAM PWR PLT' : [ 'USC00508584', 0, 0, 0, 1, 0, 0 ],
-  'SNOWSHOE LAKE' : [ 'USC00508594', 0, 0, 0, 1, 0, 0 ],
-  'SOLDOTNA 5SSW' : [ 'USC00508615', 0, 0, 0, 1, 0, 0 ],
-  'SOURDOUGH 1 N' : [ 'USC00508625', 0, 0, 0, 1, 0, 0 ],
-  'ST GEORGE ISLAND AP' : [ 'USW00025628', 0, 0, 0, 1, 0, 0 ],
-  'SUSITNA LANDING' : [ 'USC00508884', 0, 0, 0, 1, 0, 0 ],
-  'SUTTON 1 W' : [ 'USC00508915', 0, 0, 0, 1, 0, 0 ],
-  'TAHNETA PASS' : [ 'USC00508945', 0, 0, 0, 1, 0, 0 ],
-  'TANANA AP' : [ 'USW00026529', 0, 0, 0, 0, 0, 0 ],
-  'TOK' : [ 'USC00509313', 0, 0, 0, 1, 0, 0 ],
-  'TONSINA' : [ 'USC00509385', 0, 0, 0, 1, 0, 0 ],
-  'TUTKA BAY LAGOON' : [ 'USC00509460', 0, 0, 0, 1, 0, 0 ],
-  'TWO RIVERS' : [ 'USC00509489', 0, 0, 0, 1, 0, 0 ],
-  'UMIAT' : [ 'USW00026508', 0, 0, 0, 1, 0, 0 ],
-  'UNIVERSITY EXP STN' : [ 'USC00509641', 0, 0, 0, 1, 0, 0 ],
-  'VALDEZ AIRPORT' : [ 'USC00509685', 0, 0, 0, 1, 0, 0 ],
-  'WAINWRIGHT' : [ 'USW00027503', 0, 0, 0, 1, 0, 0 ],
-  'WALES' : [ 'USW00026618', 0, 0, 0, 1, 0, 0 ],
-  'WALLY NOERENBERG HATCH' : [ 'USC00509747', 0, 0, 0, 1, 0, 0 ],
-  'WASILLA 3 S' : [ 'USC00509759', 0, 0, 0, 1, 0, 0 ],
-  'WHITES CROSSING' : [ 'USC00509790', 0, 0, 0, 1, 0, 0 ],
-  'WHITESTONE FARMS' : [ 'USC00509793', 0, 0, 0, 1, 0, 0 ],
-  'WHITTIER' : [ 'USC00509829', 0, 0, 0, 1, 0, 0 ],
-  'WILLOW WEST' : [ 'USC00509861', 0, 0, 0, 1, 0, 0 ],
-  'WISEMAN' : [ 'USC00509869', 0, 0, 0, 1, 0, 0 ],
-  'WOODSMOKE' : [ 'USC00509891', 0, 0, 0, 1, 0, 0 ],
-  'WRANGELL AIRPORT' : [ 'USC00509919', 0, 0, 0, 1, 0, 0 ],
-
-}
+import logging
+import numpy as np
+
+# module logger, so warnings at import don't configure the root logger
+logger = logging.getLogger(__name__)
+
+STATIONS = [
+
+  ('Anchorage', [ 'USW00026451', 1, 1, 0, 1, 1, 0 ]),
+  ('Annette', [ 'USW00025308', 0, 0, 0, 1, 1, 0 ]),
+  ('Bethel', ['USW00026615', 1, 0, 0, 1, 1, 0 ]),
+  ('Bettles', ['USW00026533', 1, 0, 0, 1, 1, 0 ]),
+  ('Big Delta', [ 'USW00026415', 0, 0, 0, 1, 0, 0 ]),
+  ('Cold Bay', [ 'USW00025624', 1, 0, 0, 1, 1, 0 ]),
+  ('Delta Junction', [ 'USW00026415', 1, 1, 0, 1, 1, 0 ]),
+  ('Fairbanks', [ 'USW00026411', 1, 1, 0, 1, 1, 0.5 ]),
+  ('Gulkana', [ 'USW00026425', 1, 0, 0, 1, 1, 0 ]),
+  ('Homer', [ 'USW00025507', 1, 0, 0, 1, 1, 0 ]),
+  ('Juneau', [ 'USW00025309', 1, 1, 0, 1, 1, 0 ]),
+  ('Ketchikan', [ 'USW00025325', 1, 1, 0, 1, 0, 0 ]),
+  ('King Salmon', [ 'USW00025503', 1, 1, 0, 1, 1, 0 ]),
+  ('Kodiak', [ 'USW00025501', 1, 1, 0, 1, 1, -0.5 ]),
+  ('Kotzebue', [ 'USW00026616', 1, 0, 0, 1, 1, 0 ]),
+  ('McGrath', [ 'USW00026510', 1, 0, 0, 1, -1, 1 ]),
+  ('Nome', [ 'USW00026617', 1, 1, 0, 1, 1, 0 ]),
+  ('St. Paul Island', [ 'USW00025713', 1, 0, 0, 1, 1, 0 ]),
+  ('Talkeetna', [ 'USW00026528', 1, 0, 0, 1, 0.8, 0.8 ]),
+  ('Utqiaġvik', ['USW00027502', 1, 1, 0, 1, 1.2, 0 ]),
+  ('Valdez', [ 'USW00026442', 0, 0, 1, 0, 0, 0 ]),
+  ('Yakutat', [ 'USW00025339', 1, 0, 0, 1, 0, 1 ]),
+  ('ADAK', [ 'USW00025704', 0, 0, 0, 1, 0, 0 ]),
+  ('ALYESKA', [ 'USC00500243', 0, 0, 0, 1, 0, 0 ]),
+  ('AMBER LAKE', [ 'USC00500247', 0, 0, 0, 1, 0, 0 ]),
+  ('ANCHORAGE FRCST OFC', [ 'USC00500275', 0, 0, 0, 1, 0, 0 ]),
+  ('ANCHORAGE HILLSIDE', [ 'USC00500279', 0, 0, 0, 1, 0, 0 ]),
+  ('ANCHORAGE LAKE HOOD AP', [ 'USW00026491', 0, 0, 0, 1, 0, 0 ]),
+  ('ANCHORAGE RABBIT CK #2', [ 'USC00500284', 0, 0, 0, 1, 0, 0 ]),
+  ('ANCHORAGE UPPER DEARMOUN', [ 'USC00500281', 0, 0, 0, 1, 0, 0 ]),
+  ('ANCHORAGE WB AP', [ 'USW00026409', 0, 0, 0, 1, 0, 0 ]),
+  ('ANDERSON LAKE', [ 'USC00500302', 0, 0, 0, 1, 0, 0 ]),
+  ('ANNEX CREEK', [ 'USC00500363', 0, 0, 0, 1, 0, 0 ]),
+  ('AUKE BAY', [ 'USC00500464', 0, 0, 0, 1, 0, 0 ]),
+  ('AURORA', [ 'USC00500490', 0, 0, 0, 1, 0, 0 ]),
+  ('BEAVER FALLS', [ 'USC00500657', 0, 0, 0, 1, 0, 0 ]),
+  ('BENS FARM', [ 'USC00500707', 0, 0, 0, 1, 0, 0 ]),
+  ('BIG RIVER LAKES', [ 'USC00500788', 0, 0, 0, 1, 0, 0 ]),
+  ('BLASHKE ISLAND', [ 'USC00500832', 0, 0, 0, 1, 0, 0 ]),
+  ('BUTTE 1W', [ 'USC00501180', 0, 0, 0, 1, 0, 0 ]),
+  ('BUTTE 3NNE', [ 'USC00501175', 0, 0, 0, 1, 0, 0 ]),
+  ('CAMPBELL CREEK SCI CTR', [ 'USC00501220', 0, 0, 0, 1, 0, 0 ]),
+  ('CANNERY CREEK', [ 'USC00501240', 0, 0, 0, 1, 0, 0 ]),
+  ('CANTWELL 2 E', [ 'USC00501243', 0, 0, 0, 1, 0, 0 ]),
+  ('CANTWELL 4E', [ 'USC00501244', 0, 0, 0, 1, 0, 0 ]),
+  ('CENTRAL #2', [ 'USC00501466', 0, 0, 0, 1, 0, 0 ]),
+  ('CHANDALAR LAKE', [ 'USC00501492', 0, 0, 0, 1, 0, 0 ]),
+  ('CHANDALAR SHELF DOT', [ 'USC00501497', 0, 0, 0, 1, 0, 0 ]),
+  ('CHICKEN', [ 'USC00501684', 0, 0, 0, 1, 0, 0 ]),
+  ('CHULITNA RIVER', [ 'USC00501926', 0, 0, 0, 1, 0, 0 ]),
+  ('CIRCLE HOT SPRINGS', [ 'USC00501987', 0, 0, 0, 1, 0, 0 ]),
+  ('CLEARWATER', [ 'USC00502019', 0, 0, 0, 1, 0, 0 ]),
+  ('COLLEGE 5 NW', [ 'USC00502112', 0, 0, 0, 1, 0, 0 ]),
+  ('COLLEGE OBSY', [ 'USC00502107', 0, 0, 0, 1, 0, 0 ]),
+  ('COLVILLE VILLAGE', [ 'USC00502126', 0, 0, 0, 1, 0, 0 ]),
+  ('COOPER LAKE PROJECT', [ 'USC00502144', 0, 0, 0, 1, 0, 0 ]),
+  ('COOPER LANDING 5 W', [ 'USC00502149', 0, 0, 0, 1, 0, 0 ]),
+  ('CORDOVA AP', [ 'USW00026410', 0, 0, 0, 1, 0, 0 ]),
+  ('CORDOVA NORTH', [ 'USC00502173', 0, 0, 0, 1, 0, 0 ]),
+  ('CRAIG', [ 'USC00502227', 0, 0, 0, 1, 0, 0 ]),
+  ('DEADHORSE', [ 'USW00027406', 0, 0, 0, 1, 0, 0 ]),
+  ('DELTA_5_NE', [ 'USC00502350', 0, 0, 0, 1, 0, 0 ]),
+  ('DELTA_6N', [ 'USC00502339', 0, 0, 0, 1, 0, 0 ]),
+  ('DELTA_JUNCTION_20SE', [ 'USC00502352', 0, 0, 0, 1, 0, 0 ]),
+  ('DILLINGHAM FAA AP', [ 'USC00502457', 0, 0, 0, 1, 0, 0 ]),
+  ('DRY CREEK', [ 'USC00502568', 0, 0, 0, 1, 0, 0 ]),
+  ('DUTCH HARBOR', [ 'USC00502587', 0, 0, 0, 1, 0, 0 ]),
+  ('EAGLE', [ 'USW00026422', 0, 0, 0, 1, 0, 0 ]),
+  ('EAGLE RIVER 5 SE', [ 'USC00502656', 0, 0, 0, 1, 0, 0 ]),
+  ('EAGLE RVR GAKONA CIR', [ 'USC00502645', 0, 0, 0, 1, 0, 0 ]),
+  ('EAGLE RVR NATURE CTR', [ 'USC00502642', 0, 0, 0, 1, 0, 0 ]),
+  ('EIELSON FLD', [ 'USC00502707', 0, 0, 0, 1, 0, 0 ]),
+  ('EIELSON VISITOR CTR', [ 'USC00502711', 0, 0, 0, 1, 0, 0 ]),
+  ('EKLUTNA WTP', [ 'USC00502737', 0, 0, 0, 1, 0, 0 ]),
+  ('ELFIN COVE', [ 'USC00502785', 0, 0, 0, 1, 0, 0 ]),
+  ('ELMENDORF AFB', [ 'USW00026401', 0, 0, 0, 1, 0, 0 ]),
+  ('ESTER', [ 'USC00502870', 0, 0, 0, 1, 0, 0 ]),
+  ('ESTER 5NE', [ 'USC00502871', 0, 0, 0, 1, 0, 0 ]),
+  ('ESTER DOME', [ 'USC00502868', 0, 0, 1, 1, 0, 0 ]),
+  ('FAIRBANKS 11 NE', [ 'USW00026494', 0, 0, 0, 1, 0, 0 ]),
+  ('FAIRBANKS AP #2', [ 'USC00502965', 0, 0, 0, 1, 0, 0 ]),
+  ('FAIRBANKS MIDTOWN', [ 'USC00502970', 0, 0, 0, 1, 0, 0 ]),
+  ('FAREWELL LAKE', [ 'USC00503009', 0, 0, 0, 1, 0, 0 ]),
+  ('FOX 2 SE', [ 'USC00503181', 0, 0, 0, 1, 0, 0 ]),
+  ('FT KNOX MINE', [ 'USC00503160', 0, 0, 0, 1, 0, 0 ]),
+  ('FT RICHARDSON WTP', [ 'USC00503163', 0, 0, 0, 1, 0, 0 ]),
+  ('FUNNY RIVER', [ 'USC00503196', 0, 0, 0, 1, 0, 0 ]),
+  ('FUNTER BAY', [ 'USC00503198', 0, 0, 0, 1, 0, 0 ]),
+  ('GALENA', [ 'USC00503212', 0, 0, 0, 1, 0, 0 ]),
+  ('GILMORE CREEK', [ 'USC00503275', 0, 0, 0, 1, 0, 0 ]),
+  ('GLACIER BAY', [ 'USC00503294', 0, 0, 0, 1, 0, 0 ]),
+  ('GLEN ALPS', [ 'USC00503299', 0, 0, 0, 1, 0, 0 ]),
+  ('GLENNALLEN KCAM', [ 'USC00503304', 0, 0, 0, 1, 0, 0 ]),
+  ('GUSTAVUS', [ 'USW00025322', 0, 0, 0, 1, 0, 0 ]),
+  ('HAINES #2', [ 'USC00503502', 0, 0, 0, 1, 0, 0 ]),
+  ('HAINES 40 NW', [ 'USC00503504', 0, 0, 0, 1, 0, 0 ]),
+  ('HAINES AP', [ 'USW00025323', 0, 0, 0, 1, 0, 0 ]),
+  ('HAYES RIVER', [ 'USC00503573', 0, 0, 0, 1, 0, 0 ]),
+  ('HEALY 2 NW', [ 'USC00503585', 0, 0, 0, 1, 0, 0 ]),
+  ('HIDDEN FALLS HATCHERY', [ 'USC00503605', 0, 0, 0, 1, 0, 0 ]),
+  ('HOLLIS', [ 'USC00503650', 0, 0, 0, 1, 0, 0 ]),
+  ('HOMER 8 NW', [ 'USC00503672', 0, 0, 0, 1, 0, 0 ]),
+  ('HOMER 9 E', [ 'USC00503682', 0, 0, 0, 1, 0, 0 ]),
+  ('HOONAH', [ 'USC00503695', 0, 0, 0, 1, 0, 0 ]),
+  ('HOPE', [ 'USC00503720', 0, 0, 0, 1, 0, 0 ]),
+  ('HYDER', [ 'USC00503821', 0, 0, 0, 1, 0, 0 ]),
+  ('ILIAMNA AP', [ 'USW00025506', 0, 0, 0, 1, 0, 0 ]),
+  ('INTRICATE BAY', [ 'USC00503933', 0, 0, 0, 1, 0, 0 ]),
+  ('JUNEAU DWTN', [ 'USC00504094', 0, 0, 0, 1, 0, 0 ]),
+  ('JUNEAU FORECAST OFFICE', [ 'USC00504103', 0, 0, 0, 1, 0, 0 ]),
+  ('JUNEAU LENA PT', [ 'USC00504107', 0, 0, 0, 1, 0, 0 ]),
+  ('JUNEAU MILE 17', [ 'USC00504109', 0, 0, 0, 1, 0, 0 ]),
+  ('KALTAG AP', [ 'USW00026502', 0, 0, 0, 1, 0, 0 ]),
+  ('KASILOF 3 NW', [ 'USC00504425', 0, 0, 0, 1, 0, 0 ]),
+  ('KENAI 9N', [ 'USC00504550', 0, 0, 0, 1, 0, 0 ]),
+  ('KENAI AP', [ 'USW00026523', 0, 0, 0, 1, 0, 0 ]),
+  ('KENNY LAKE 7SE', [ 'USC00504567', 0, 0, 0, 1, 0, 0 ]),
+  ('KETCHIKAN', [ 'USW00025325', 0, 0, 0, 1, 0, 0 ]),
+  ('KEYSTONE RIDGE', [ 'USC00504621', 0, 0, 0, 1, 0, 0 ]),
+  ('KITOI BAY', [ 'USC00504812', 0, 0, 0, 1, 0, 0 ]),
+  ('KIVALINA AP', [ 'USW00026642', 0, 0, 0, 1, 0, 0 ]),
+  ('KLAWOCK AP', [ 'USW00025367', 0, 0, 0, 1, 0, 0 ]),
+  ('KOBE HILL', [ 'USC00504971', 0, 0, 0, 1, 0, 0 ]),
+  ('KODIAK WWTP', [ 'USC00504991', 0, 0, 0, 1, 0, 0 ]),
+  ('KOTZEBUE 25 N', [ 'USC00505051', 0, 0, 0, 1, 0, 0 ]),
+  ('KUPARUK', [ 'USC00505136', 0, 0, 0, 1, 0, 0 ]),
+  ('LAKE SUSITNA', [ 'USC00505397', 0, 0, 0, 1, 0, 0 ]),
+  ('LAZY MTN', [ 'USC00505464', 0, 0, 0, 1, 0, 0 ]),
+  ('LITTLE CHENA RVR', [ 'USC00505516', 0, 0, 1, 0, 0, 0 ]),
+  ('LITTLE PORT WALTER', [ 'USC00505519', 0, 0, 0, 1, 0, 0 ]),
+  ('MAIN BAY', [ 'USC00505604', 0, 0, 0, 1, 0, 0 ]),
+  ('MANLEY HOT SPRINGS', [ 'USC00505644', 0, 0, 0, 1, 0, 0 ]),
+  ('MATANUSKA EXPERIMENT FARM', [ 'USC00505733', 0, 0, 0, 1, 0, 0 ]),
+  ('MCCARTHY 3 SW', [ 'USC00505757', 0, 0, 0, 1, 0, 0 ]),
+  ('MCKINLEY PARK', [ 'USC00505778', 0, 0, 0, 1, 0, 0 ]),
+  ('MILE 39 STEESE', [ 'USC00505873', 0, 0, 0, 1, 0, 0 ]),
+  ('MILE 42 STEESE', [ 'USC00505880', 0, 0, 0, 1, 0, 0 ]),
+  ('MINCHUMINA', [ 'USW00026512', 0, 0, 1, 0, 0, 0 ]),
+  ('MIRROR LAKE SCOUT CAMP', [ 'USC00505883', 0, 0, 0, 1, 0, 0 ]),
+  ('MONASHKA CREEK DAM', [ 'USC00505884', 0, 0, 0, 1, 0, 0 ]),
+  ('MOOSE PASS 3 NW', [ 'USC00505894', 0, 0, 0, 1, 0, 0 ]),
+  ('NABESNA', [ 'USC00506147', 0, 0, 0, 1, 0, 0 ]),
+  ('NENANA MUN AP', [ 'USW00026435', 0, 0, 0, 1, 0, 0 ]),
+  ('NORTH POLE', [ 'USC00506581', 0, 0, 0, 1, 0, 0 ]),
+  ('NORTHWAY AP', [ 'USW00026412', 0, 0, 0, 0, 0, 0 ]),
+  ('NUIQSUT AP', [ 'USW00027515', 0, 0, 0, 1, 0, 0 ]),
+  ('OLD EDGERTON', [ 'USC00506777', 0, 0, 0, 1, 0, 0 ]),
+  ('OUZINKIE', [ 'USC00506853', 0, 0, 0, 1, 0, 0 ]),
+  ('PALMER AP', [ 'USW00025331', 0, 0, 0, 1, 0, 0 ]),
+  ('PALMER JOB CORPS', [ 'USC00506870', 0, 0, 0, 1, 0, 0 ]),
+  ('PAXSON', [ 'USC00507097', 0, 0, 0, 1, 0, 0 ]),
+  ('PELICAN', [ 'USC00507141', 0, 0, 0, 1, 0, 0 ]),
+  ('PETERSBURG 1', [ 'USW00025329', 0, 0, 0, 1, 0, 0 ]),
+  ('PLANT MATERIALS CTR', [ 'USC00507352', 0, 0, 0, 1, 0, 0 ]),
+  ('POINT BAKER', [ 'USC00507421', 0, 0, 0, 1, 0, 0 ]),
+  ('POINT MACKENZIE', [ 'USC00507444', 0, 0, 0, 1, 0, 0 ]),
+  ('PORT ALCAN', [ 'USC00507513', 0, 0, 0, 1, 0, 0 ]),
+  ('PORT ALEXANDER', [ 'USC00507557', 0, 0, 0, 1, 0, 0 ]),
+  ('PORT ALSWORTH', [ 'USC00507570', 0, 0, 0, 1, 0, 0 ]),
+  ('PORT SAN JUAN', [ 'USC00507738', 0, 0, 0, 1, 0, 0 ]),
+  ('PORTAGE GLACIER V C (USW00026492)', [ 'USW00026492', 0, 0, 0, 1, 0, 0 ]),
+  ('PORTAGE GLACIER V C', [ 'USC00507502', 0, 0, 0, 1, 0, 0 ]),
+  ('PRUDHOE BAY', [ 'USC00507780', 0, 0, 0, 1, 0, 0 ]),
+  ('PUNTILLA', [ 'USC00507783', 0, 0, 0, 1, 0, 0 ]),
+  ('SALCHA', [ 'USC00508140', 0, 0, 0, 1, 0, 0 ]),
+  ('SAND POINT', [ 'USC00508183', 0, 0, 0, 1, 0, 0 ]),
+  ('SELDOVIA AP', [ 'USW00025516', 0, 0, 0, 1, 0, 0 ]),
+  ('SEWARD', [ 'USW00026438', 0, 0, 0, 1, 0, 0 ]),
+  ('SEWARD 19N', [ 'USC00508377', 0, 0, 0, 1, 0, 0 ]),
+  ('SEWARD 8 NW', [ 'USC00508375', 0, 0, 0, 1, 0, 0 ]),
+  ('SHEEP MTN LODGE', [ 'USC00508409', 0, 0, 0, 1, 0, 0 ]),
+  ('SHEMYA USAF BASE', [ 'USW00045715', 0, 0, 0, 1, 0, 0 ]),
+  ('SILVER LAKE', [ 'USC00508470', 0, 0, 0, 1, 0, 0 ]),
+  ('SITKA JAPONSKI AP', [ 'USW00025333', 0, 0, 0, 1, 0, 0 ]),
+  ('SKAGWAY (USW00025335)', [ 'USW00025335', 0, 0, 0, 1, 0, 0 ]),
+  ('SKAGWAY', [ 'USC00508525', 0, 0, 0, 1, 0, 0 ]),
+  ('SKWENTNA', [ 'USW00026514', 0, 0, 0, 1, 0, 0 ]),
+  ('SLANA', [ 'USC00508547', 0, 0, 0, 1, 0, 0 ]),
+  ('SNETTISHAM PWR PLT', [ 'USC00508584', 0, 0, 0, 1, 0, 0 ]),
+  ('SNOWSHOE LAKE', [ 'USC00508594', 0, 0, 0, 1, 0, 0 ]),
+  ('SOLDOTNA 5SSW', [ 'USC00508615', 0, 0, 0, 1, 0, 0 ]),
+  ('SOURDOUGH 1 N', [ 'USC00508625', 0, 0, 0, 1, 0, 0 ]),
+  ('ST GEORGE ISLAND AP', [ 'USW00025628', 0, 0, 0, 1, 0, 0 ]),
+  ('SUSITNA LANDING', [ 'USC00508884', 0, 0, 0, 1, 0, 0 ]),
+  ('SUTTON 1 W', [ 'USC00508915', 0, 0, 0, 1, 0, 0 ]),
+  ('TAHNETA PASS', [ 'USC00508945', 0, 0, 0, 1, 0, 0 ]),
+  ('TANANA AP', [ 'USW00026529', 0, 0, 0, 0, 0, 0 ]),
+  ('TOK', [ 'USC00509313', 0, 0, 0, 1, 0, 0 ]),
+  ('TONSINA', [ 'USC00509385', 0, 0, 0, 1, 0, 0 ]),
+  ('TUTKA BAY LAGOON', [ 'USC00509460', 0, 0, 0, 1, 0, 0 ]),
+  ('TWO RIVERS', [ 'USC00509489', 0, 0, 0, 1, 0, 0 ]),
+  ('UMIAT', [ 'USW00026508', 0, 0, 0, 1, 0, 0 ]),
+  ('UNIVERSITY EXP STN', [ 'USC00509641', 0, 0, 0, 1, 0, 0 ]),
+  ('VALDEZ AIRPORT', [ 'USC00509685', 0, 0, 0, 1, 0, 0 ]),
+  ('WAINWRIGHT', [ 'USW00027503', 0, 0, 0, 1, 0, 0 ]),
+  ('WALES', [ 'USW00026618', 0, 0, 0, 1, 0, 0 ]),
+  ('WALLY NOERENBERG HATCH', [ 'USC00509747', 0, 0, 0, 1, 0, 0 ]),
+  ('WASILLA 3 S', [ 'USC00509759', 0, 0, 0, 1, 0, 0 ]),
+  ('WHITES CROSSING', [ 'USC00509790', 0, 0, 0, 1, 0, 0 ]),
+  ('WHITESTONE FARMS', [ 'USC00509793', 0, 0, 0, 1, 0, 0 ]),
+  ('WHITTIER', [ 'USC00509829', 0, 0, 0, 1, 0, 0 ]),
+  ('WILLOW WEST', [ 'USC00509861', 0, 0, 0, 1, 0, 0 ]),
+  ('WISEMAN', [ 'USC00509869', 0, 0, 0, 1, 0, 0 ]),
+  ('WOODSMOKE', [ 'USC00509891', 0, 0, 0, 1, 0, 0 ]),
+  ('WRANGELL AIRPORT', [ 'USC00509919', 0, 0, 0, 1, 0, 0 ]),
+
+]
+
+
+# type flags: bit stationtype - 1 is set for the stations tagged at that position
+FIRST_ORDER = 1 << 0
+SUMMARY = 1 << 1
+UNMAINTAINED = 1 << 2
+ALL = 1 << 3
+TYPES = (FIRST_ORDER, SUMMARY, UNMAINTAINED, ALL)
+
+
+class StationRegistry:
+    """Stations held column-wise in numpy arrays
+
+    names, ids, flags (bitmask of TYPES) and label_x/label_y are arrays with
+    one entry per station; index() and with_id() look stations up in dicts and
+    of_type() returns index arrays computed once at load time.
+    A name listed twice with the same id is dropped, a name listed twice with
+    different ids keeps the plain name for the last entry (as the old dict did)
+    and the earlier one becomes 'NAME (ID)'; both cases are logged.
+    """
+    def __init__(self, entries):
+        names, ids, flags, labels = [], [], [], []
+        index = {}
+        for (name, values) in entries:
+            sid = values[0]
+            if name in index:
+                k = index.pop(name)
+                if ids[k] == sid:
+                    logger.warning("Dropping repeated station {} ({})".format(name, sid))
+                    index[name] = k
+                    continue
+                renamed = '{} ({})'.format(name, ids[k])
+                logger.warning("Station name {} is used for {} and {}, keeping the first as {}".format(
+                    name, ids[k], sid, renamed))
+                names[k] = renamed
+                index[renamed] = k
+            index[name] = len(names)
+            names.append(name)
+            ids.append(sid)
+            flags.append(sum(bit for (bit, tag) in zip(TYPES, values[1:5]) if tag == 1))
+            labels.append(values[5:7])
+
+        self.names = np.array(names)
+        self.ids = np.array(ids)
+        self.flags = np.array(flags, dtype=np.uint8)
+        self.label_x, self.label_y = np.array(labels, dtype=float).reshape(-1, 2).T
+        self._index = index
+        self._by_id = {}
+        for k, sid in enumerate(ids):
+            self._by_id.setdefault(sid, []).append(k)
+        self._types = {
+            stationtype: np.flatnonzero(self.flags & bit)
+            for stationtype, bit in enumerate(TYPES, 1)}
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self._index
+
+    def index(self, name):
+        return self._index[name]
+
+    def with_id(self, sid):
+        """names of the stations using ACIS id sid"""
+        return self.names[self._by_id.get(sid, [])].tolist()
+
+    def of_type(self, stationtype):
+        """indices of the stations tagged with stationtype (1-4)"""
+        return self._types[stationtype]
+
+    def select(self, stationtype):
+        """(name, id) of the stations tagged with stationtype (1-4)"""
+        selected = self.of_type(stationtype)
+        return list(zip(self.names[selected].tolist(), self.ids[selected].tolist()))
+
+
+registry = StationRegistry(STATIONS)
+
+# name -> [id, flags..., label x, label y] as before, for older scripts
+stations = dict(STATIONS)
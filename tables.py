@@ -0,0 +1,92 @@
+# Columnar binary file holding the rise/set times of every station in a run
+#
+# layout: MAGIC, little endian uint32 header length, json header, zero padding
+# up to a multiple of ALIGN bytes, then an int32 array of shape
+# (stations, days, columns) in C order. Each value is the number of seconds
+# from the local midnight that starts the day to the event, MISSING if there
+# is no value. The header lists the stations, columns, first date, number of
+# days and timezone offset, so readers can memory map the array directly.
+
+import json
+import struct
+import numpy as np
+import pandas as pd
+
+MAGIC = b'DAYNIGHT1\n'
+ALIGN = 64
+MISSING = np.iinfo(np.int32).min
+
+
+## MAGIC, header length and json header padded to ALIGN bytes, the head of the
+## table files and of other files with this layout (cube.py) under their own magic
+def header_bytes(header, magic=MAGIC):
+    text = json.dumps(header).encode()
+    size = len(magic) + 4 + len(text)
+    padding = -size % ALIGN
+    return magic + struct.pack('<I', len(text) + padding) + text + b' ' * padding
+
+
+## (header, offset of the data) of a file written with header_bytes
+def read_header(path, magic=MAGIC, kind='daylight table'):
+    with open(path, 'rb') as handle:
+        if handle.read(len(magic)) != magic:
+            raise ValueError('{} is not a {} file'.format(path, kind))
+        (length,) = struct.unpack('<I', handle.read(4))
+        header = json.loads(handle.read(length).decode())
+    return header, len(magic) + 4 + length
+
+
+## create a table file and return it as a writable memory map
+def create_tables(path, stations, columns, start, days, tz_offset_h):
+    header = {
+        'stations': list(stations),
+        'columns': list(columns),
+        'start': str(pd.Timestamp(start).date()),
+        'days': int(days),
+        'tz_offset_h': tz_offset_h,
+        'dtype': '<i4',
+        'missing': int(MISSING),
+    }
+    head = header_bytes(header)
+    with open(path, 'wb') as handle:
+        handle.write(head)
+    data = np.memmap(
+        path, dtype='<i4', mode='r+', offset=len(head),
+        shape=(len(header['stations']), header['days'], len(header['columns'])))
+    data[:] = MISSING
+    return data
+
+
+## read the header of a table file and memory map its array
+def read_tables(path, mode='r'):
+    header, offset = read_header(path)
+    data = np.memmap(
+        path, dtype=header['dtype'], mode=mode, offset=offset,
+        shape=(len(header['stations']), header['days'], len(header['columns'])))
+    return header, data
+
+
+## datetime64 values rounded to the nearest second (halves up), NaT stays NaT
+def round_seconds(values):
+    values = np.asarray(values, dtype='datetime64[ns]')
+    return (values + np.timedelta64(500, 'ms')).astype('datetime64[s]').astype('datetime64[ns]')
+
+
+## seconds from each date to the matching event, as stored in the table file
+def seconds_since(dates, events):
+    dates = np.asarray(dates, dtype='datetime64[ns]')
+    events = round_seconds(events)
+    if events.ndim > dates.ndim:
+        dates = dates[:, None]
+    delta = (events - dates).astype('int64') // 10**9
+    return np.where(np.isnat(events), MISSING, delta).astype('<i4')
+
+
+## event times back from a table file: datetime64 array of shape (days, columns) for one station
+def station_times(header, data, station):
+    dates = (
+        np.datetime64(header['start'], 'ns')
+        + np.arange(header['days']) * np.timedelta64(86400, 's'))
+    values = np.asarray(data[header['stations'].index(station)])
+    times = dates[:, None] + values.astype('timedelta64[s]')
+    return np.where(values == MISSING, np.datetime64('NaT'), times)